@@ -0,0 +1,1035 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the indexing and search pipeline
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from embedders import FakeEmbeddings, HashingEmbeddings
+from vector_formats import VECTOR_FORMATS
+from index_manifest import IndexManifest
+from simple_tree_sitter_chunker import BlockIndex, SimpleTreeSitterChunker
+from source_file import SourceFile
+import re
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence stdout (the indexer's progress output) inside the block"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def generate_chunks(count: int):
+    """Generate synthetic TSX chunks shaped like SimpleTreeSitterChunker output"""
+    chunks = []
+    for i in range(count):
+        name = f"Component{i}"
+        code = "\n".join(
+            [
+                f"const {name} = () => {{",
+                f"  // Render item {i}",
+                "  return (",
+                f'    <div className="item-{i}">{name}</div>',
+                "  );",
+                "};",
+            ]
+        )
+        chunks.append(
+            {
+                "type": "component",
+                "name": name,
+                "code": code,
+                "start_line": 0,
+                "end_line": 5,
+                "node_type": "component",
+                "file_path": f"src/generated/{name}/index.tsx",
+                "file_name": "index.tsx",
+                "total_lines": 6,
+                "file_size": len(code),
+            }
+        )
+    return chunks
+
+
+def bench_index(chunk_count: int = 2000, latency: float = 0.02, batch_sizes=(1, 16, 64, 256)):
+    """Measure index_chunks throughput for several batch sizes with a fake embedder"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: index_chunks, {chunk_count} chunks, {latency * 1000:.0f}ms per embedding call")
+    print("=" * 60)
+    chunks = generate_chunks(chunk_count)
+
+    for batch_size in batch_sizes:
+        with tempfile.TemporaryDirectory() as db_path:
+            embeddings = FakeEmbeddings(latency=latency)
+            indexer = CodeIndexer(
+                db_path=db_path, embeddings=embeddings, batch_size=batch_size, use_cache=False
+            )
+            start = time.perf_counter()
+            indexed = indexer.index_chunks(chunks)
+            elapsed = time.perf_counter() - start
+            print(
+                f"batch_size={batch_size:<4} indexed={indexed:<6} "
+                f"embed_calls={embeddings.calls:<6} time={elapsed:.2f}s "
+                f"throughput={indexed / elapsed:.0f} chunks/s"
+            )
+
+
+def bench_embedders(chunk_count: int = 5000, latency: float = 0.3, worker_counts=(1, 2, 4)):
+    """Compare index_chunks throughput of a remote-latency embedder with the local hashing embedder"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: embedders, {chunk_count} chunks, {os.cpu_count()} cores")
+    print("=" * 60)
+    chunks = generate_chunks(chunk_count)
+    embedders = [(f"remote {latency * 1000:.0f}ms/call", FakeEmbeddings(latency=latency))]
+    embedders += [(f"hashing workers={workers}", HashingEmbeddings(workers=workers)) for workers in worker_counts]
+    for name, embeddings in embedders:
+        if isinstance(embeddings, HashingEmbeddings):
+            # Start the worker processes outside the timed run
+            embeddings.embed_documents(["warm up"] * embeddings.min_parallel * embeddings.workers)
+        with tempfile.TemporaryDirectory() as db_path:
+            with quiet():
+                indexer = CodeIndexer(db_path=db_path, embeddings=embeddings, use_cache=False)
+                start = time.perf_counter()
+                indexed = indexer.index_chunks(chunks)
+                elapsed = time.perf_counter() - start
+            print(f"{name:<22} time={elapsed:.2f}s throughput={indexed / elapsed:.0f} chunks/s")
+        if isinstance(embeddings, HashingEmbeddings):
+            embeddings.close()
+
+
+def bench_cache(chunk_count: int = 2000, latency: float = 0.02):
+    """Index the same chunks twice and compare embedding calls with a warm cache"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: embedding cache, {chunk_count} chunks indexed twice")
+    print("=" * 60)
+    chunks = generate_chunks(chunk_count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = f"{tmp_dir}/code_database"
+        for run in ("cold", "warm"):
+            embeddings = FakeEmbeddings(latency=latency)
+            indexer = CodeIndexer(db_path=db_path, embeddings=embeddings)
+            start = time.perf_counter()
+            indexer.index_chunks(chunks)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{run}: embed_calls={embeddings.calls} hits={indexer.cache.hits} "
+                f"misses={indexer.cache.misses} time={elapsed:.2f}s"
+            )
+            indexer.cache.close()
+
+
+def replicate_tree(src_path: str, target_dir: str, copies: int) -> int:
+    """Copy every TSX/TS file under src_path `copies` times into target_dir"""
+    count = 0
+    for root, _, files in os.walk(src_path):
+        for name in files:
+            if not name.endswith((".ts", ".tsx")):
+                continue
+            relative = os.path.relpath(os.path.join(root, name), src_path)
+            for copy in range(copies):
+                destination = os.path.join(target_dir, f"copy{copy}", relative)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copyfile(os.path.join(root, name), destination)
+                count += 1
+    return count
+
+
+def bench_chunk(src_path: str = "src", copies: int = 50, worker_counts=(1, 2, 4, 8)):
+    """Measure chunk_directory scaling across worker counts for both chunkers"""
+    chunkers = [("SimpleTreeSitterChunker", SimpleTreeSitterChunker)]
+    try:
+        from tree_sitter_chunker import TreeSitterChunker
+
+        TreeSitterChunker()
+        chunkers.append(("TreeSitterChunker", TreeSitterChunker))
+    except Exception as e:
+        print(f"Skipping TreeSitterChunker: {e}")
+
+    with tempfile.TemporaryDirectory() as corpus:
+        file_count = replicate_tree(src_path, corpus, copies)
+        print(f"Benchmark: chunk_directory, {file_count} files ({copies} copies of {src_path})")
+        print("=" * 60)
+        for name, chunker_class in chunkers:
+            baseline = None
+            for workers in worker_counts:
+                chunker = chunker_class()
+                with quiet():
+                    start = time.perf_counter()
+                    chunks = chunker.chunk_directory(corpus, workers=workers)
+                    elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(
+                    f"{name} workers={workers:<2} chunks={len(chunks):<7} time={elapsed:.2f}s "
+                    f"files/s={file_count / elapsed:.0f} speedup={baseline / elapsed:.2f}x"
+                )
+
+
+LEGACY_FUNCTION_PATTERNS = [
+    r"function\s+(\w+)\s*\([^)]*\)\s*\{",
+    r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\{",
+    r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\(",
+    r"(\w+)\s*\([^)]*\)\s*\{",
+]
+LEGACY_COMPONENT_PATTERNS = [
+    r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\{",
+    r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\(",
+    r"export\s+default\s+function\s+(\w+)\s*\([^)]*\)\s*\{",
+    r"function\s+(\w+)\s*\([^)]*\)\s*\{",
+]
+
+
+def legacy_extract(lines):
+    """The previous two-pass extract_functions/extract_components, for comparison"""
+    block_index = BlockIndex(lines)
+    results = []
+    for chunk_type, node_type, patterns in (
+        ("function", "function_declaration", LEGACY_FUNCTION_PATTERNS),
+        ("component", "component", LEGACY_COMPONENT_PATTERNS),
+    ):
+        chunks = []
+        for i, line in enumerate(lines):
+            for pattern in patterns:
+                match = re.search(pattern, line)
+                if match:
+                    end_line = block_index.end(i)
+                    chunks.append(
+                        {
+                            "type": chunk_type,
+                            "name": match.group(1),
+                            "code": "\n".join(lines[i : end_line + 1]),
+                            "start_line": i,
+                            "end_line": end_line,
+                            "node_type": node_type,
+                        }
+                    )
+                    break
+        results.append(chunks)
+    return tuple(results)
+
+
+def generate_tsx_corpus(src_path: str = "src", target_lines: int = 100_000):
+    """Repeat the TSX/TS files under src_path until the corpus has target_lines lines"""
+    sources = []
+    for root, _, files in os.walk(src_path):
+        for name in sorted(files):
+            if name.endswith((".ts", ".tsx")):
+                with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                    sources.append(f.read().split("\n"))
+    corpus, total = [], 0
+    while total < target_lines:
+        for lines in sources:
+            corpus.append(lines)
+            total += len(lines)
+            if total >= target_lines:
+                break
+    return corpus, total
+
+
+def bench_scan(src_path: str = "src", target_lines: int = 100_000, repeat: int = 3):
+    """Compare lines/sec of the legacy two-pass scan against extract_definitions"""
+    corpus, total = generate_tsx_corpus(src_path, target_lines)
+    chunker = SimpleTreeSitterChunker()
+    print(f"Benchmark: definition scan, {total} lines in {len(corpus)} files")
+    print("=" * 60)
+
+    identical = all(
+        legacy_extract(lines) == chunker.extract_definitions({"lines": lines}, "")
+        for lines in corpus
+    )
+    for name, extract in (
+        ("before (two passes, re.search)", legacy_extract),
+        ("after (single pass, precompiled)", lambda lines: chunker.extract_definitions({"lines": lines}, "")),
+    ):
+        best = min(
+            timed(lambda: [extract(lines) for lines in corpus]) for _ in range(repeat)
+        )
+        print(f"{name:<34} time={best:.3f}s lines/s={total / best:,.0f}")
+    print(f"Identical chunks: {identical}")
+
+
+def legacy_find_function_end(lines, start_line):
+    """The previous per-match brace counter, for comparison"""
+    brace_count = 0
+    in_function = False
+    for i in range(start_line, len(lines)):
+        brace_count += lines[i].count("{")
+        brace_count -= lines[i].count("}")
+        if not in_function and "{" in lines[i]:
+            in_function = True
+        if in_function and brace_count == 0:
+            return i
+    return len(lines) - 1
+
+
+def generate_nested_file(methods: int):
+    """A class with many methods, each holding a nested callback and an unbalanced brace in a string"""
+    lines = ["class Store {"]
+    for i in range(methods):
+        lines += [
+            f"  method{i}(items) {{",
+            "    return items.map((item) => {",
+            '      const label = "{" + item.name;',
+            "      return `${label}: ${ {value: item.value}.value }`;",
+            "    });",
+            "  }",
+        ]
+    lines.append("}")
+    return lines
+
+
+def bench_blocks(method_counts=(250, 500, 1000, 2000)):
+    """Compare per-match brace counting with BlockIndex lookups on growing nested files"""
+    print("Benchmark: block-end resolution for every definition line")
+    print("=" * 60)
+    for methods in method_counts:
+        lines = generate_nested_file(methods)
+        starts = [i for i, line in enumerate(lines) if line.rstrip().endswith("{")]
+        legacy_time = timed(lambda: [legacy_find_function_end(lines, i) for i in starts])
+        index_time = timed(lambda: BlockIndex(lines))
+        block_index = BlockIndex(lines)
+        lookup_time = timed(lambda: [block_index.end(i) for i in starts])
+        mismatches = sum(legacy_find_function_end(lines, i) != block_index.end(i) for i in starts)
+        print(
+            f"lines={len(lines):<6} lookups={len(starts):<5} legacy={legacy_time:.3f}s "
+            f"index_build={index_time:.3f}s index_lookups={lookup_time:.4f}s "
+            f"legacy_mismatches={mismatches}"
+        )
+
+
+def legacy_chunk_file(chunker, file_path):
+    """The previous chunk_file ingestion: two reads, repeated splits and line joins"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    parsed_file = {"content": content, "lines": content.split("\n")}
+    with open(file_path, "r", encoding="utf-8") as f:
+        source_code = f.read()
+    functions, components = chunker.extract_definitions(parsed_file, source_code)
+    imports = chunker.extract_imports(parsed_file, source_code)
+    file_info = {"total_lines": len(source_code.split("\n")), "file_size": len(source_code)}
+    return [dict(chunk, **file_info) for chunk in functions + components + imports]
+
+
+def read_io_counters():
+    """Read syscall counters for this process from /proc (Linux only)"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+def measure(fn):
+    """Run fn and return (elapsed seconds, peak traced bytes, read syscalls, bytes read)"""
+    before = read_io_counters()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    after = read_io_counters()
+    syscr = after.get("syscr", 0) - before.get("syscr", 0)
+    rchar = after.get("rchar", 0) - before.get("rchar", 0)
+    return elapsed, peak, syscr, rchar
+
+
+def bench_ingest(src_path: str = "src", copies: int = 20, large_file_mb: int = 8):
+    """Compare legacy and single-read ingestion: time, peak memory and read syscalls"""
+    chunker = SimpleTreeSitterChunker()
+    with tempfile.TemporaryDirectory() as corpus:
+        file_count = replicate_tree(src_path, corpus, copies)
+        files = IndexManifest.list_files(corpus)
+        print(f"Benchmark: chunk_file ingestion, {file_count} files")
+        print("=" * 60)
+        for name, chunk in (
+            ("before (2 reads, 2 splits, joins)", lambda path: legacy_chunk_file(chunker, path)),
+            ("after (1 read, shared offsets)", chunker.chunk_file),
+        ):
+            elapsed, peak, syscr, rchar = measure(lambda: [chunk(path) for path in files])
+            print(
+                f"{name:<34} time={elapsed:.2f}s peak={peak / 1024:.0f}KiB "
+                f"read_syscalls={syscr} bytes_read={rchar}"
+            )
+
+        # One large generated file to show the mmap path
+        large_path = os.path.join(corpus, "large.tsx")
+        with open(files[0], "r", encoding="utf-8") as f:
+            sample = f.read()
+        with open(large_path, "w", encoding="utf-8") as f:
+            for _ in range(large_file_mb * 1024 * 1024 // max(1, len(sample))):
+                f.write(sample)
+        size = os.path.getsize(large_path)
+        print(f"\nLarge file: {size / 1024 / 1024:.1f}MiB")
+        for name, threshold in (("read()", 0), ("mmap", 1)):
+            elapsed, peak, syscr, rchar = measure(lambda: SourceFile.read(large_path, mmap_threshold=threshold))
+            print(
+                f"{name:<8} time={elapsed:.3f}s peak={peak / 1024 / 1024:.1f}MiB "
+                f"read_syscalls={syscr} bytes_read={rchar}"
+            )
+
+
+def bench_stream(src_path: str = "src", copy_counts=(10, 40), latency: float = 0.01):
+    """Compare list-then-index with the streaming pipeline: time and peak Python memory"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: streaming pipeline, {latency * 1000:.0f}ms per embedding call")
+    print("=" * 60)
+    chunker = SimpleTreeSitterChunker()
+    for copies in copy_counts:
+        with tempfile.TemporaryDirectory() as corpus:
+            file_count = replicate_tree(src_path, corpus, copies)
+            for mode in ("list", "stream"):
+                with tempfile.TemporaryDirectory() as db_path:
+                    indexer = CodeIndexer(
+                        db_path=db_path, embeddings=FakeEmbeddings(latency=latency), use_cache=False
+                    )
+                    with quiet():
+                        if mode == "list":
+                            run = lambda: indexer.index_chunks(chunker.chunk_directory(corpus))
+                        else:
+                            run = lambda: indexer.index_chunks(chunker.iter_chunks(corpus))
+                        elapsed, peak, _, _ = measure(run)
+                    print(
+                        f"files={file_count:<6} mode={mode:<6} rows={indexer.table.count_rows():<7} "
+                        f"time={elapsed:.2f}s peak={peak / 1024 / 1024:.1f}MiB"
+                    )
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+class StubHTTPError(Exception):
+    """HTTP error raised by StubHTTPEmbeddings, carrying the status code"""
+
+    def __init__(self, status_code: int, retry_after: float = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def start_stub_server(latency: float = 0.05, error_rate: float = 0.2, dimension: int = 1536):
+    """Start a local OpenAI-shaped /embeddings server that injects latency and 429s"""
+    fake = FakeEmbeddings(dimension=dimension)
+    counters = {"requests": 0, "throttled": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            counters["requests"] += 1
+            time.sleep(latency)
+            if random.random() < error_rate:
+                counters["throttled"] += 1
+                self.send_response(429)
+                self.send_header("Retry-After", "0.05")
+                self.end_headers()
+                return
+            data = [{"index": i, "embedding": fake._embed(text)} for i, text in enumerate(body["input"])]
+            payload = json.dumps({"data": data}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+class StubHTTPEmbeddings:
+    """Minimal embeddings client for the stub server"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.model = "stub"
+
+    def embed_documents(self, texts):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"input": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                data = json.loads(response.read())["data"]
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After")
+            raise StubHTTPError(e.code, float(retry_after) if retry_after else None)
+        return [item["embedding"] for item in sorted(data, key=lambda item: item["index"])]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def bench_schedule(batch_count: int = 64, latency: float = 0.05, error_rate: float = 0.2):
+    """Measure EmbeddingScheduler throughput and ordering against the stub server"""
+    from code_indexer import EmbeddingScheduler
+
+    print(
+        f"Benchmark: EmbeddingScheduler, {batch_count} batches, "
+        f"{latency * 1000:.0f}ms latency, {error_rate:.0%} 429s"
+    )
+    print("=" * 60)
+    server, counters = start_stub_server(latency, error_rate)
+    url = f"http://127.0.0.1:{server.server_address[1]}/embeddings"
+    batches = [[f"text {b}-{i}" for i in range(16)] for b in range(batch_count)]
+    fake = FakeEmbeddings()
+    expected = [[fake._embed(text) for text in batch] for batch in batches]
+
+    try:
+        for max_in_flight in (1, 2, 4, 8):
+            scheduler = EmbeddingScheduler(
+                StubHTTPEmbeddings(url), max_in_flight=max_in_flight, backoff_base=0.05
+            )
+            counters.update(requests=0, throttled=0)
+            start = time.perf_counter()
+            futures = [scheduler.submit(batch) for batch in batches]
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+            scheduler.close()
+            print(
+                f"in_flight={max_in_flight:<2} time={elapsed:.2f}s "
+                f"batches/s={batch_count / elapsed:.1f} requests={counters['requests']} "
+                f"429s={counters['throttled']} retries={scheduler.retries} "
+                f"ordered={results == expected}"
+            )
+    finally:
+        server.shutdown()
+
+
+def legacy_search_similar(indexer, query: str, limit: int, threshold: float):
+    """The previous pandas + per-row cosine search_similar, for comparison"""
+    query_embedding = indexer._get_embedding(query)
+    results = (
+        indexer.table.search(query_embedding, vector_column_name="embedding").limit(limit).to_pandas()
+    )
+    filtered_results = []
+    for _, row in results.iterrows():
+        vec1, vec2 = np.array(query_embedding), np.array(row["embedding"])
+        norm1, norm2 = np.linalg.norm(vec1), np.linalg.norm(vec2)
+        similarity = 0.0 if norm1 == 0 or norm2 == 0 else float(np.dot(vec1, vec2) / (norm1 * norm2))
+        if similarity >= threshold:
+            result_dict = row.to_dict()
+            result_dict["similarity"] = similarity
+            filtered_results.append(result_dict)
+    filtered_results.sort(key=lambda x: x["similarity"], reverse=True)
+    return filtered_results
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def bench_search(chunk_count: int = 20_000, queries: int = 50, limits=(10, 100, 1000)):
+    """Compare p50/p99 query latency of the legacy and vectorized search_similar"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: search_similar, {chunk_count} chunks, {queries} queries per limit")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as db_path:
+        indexer = CodeIndexer(db_path=db_path, embeddings=FakeEmbeddings(), use_cache=False)
+        with quiet():
+            indexer.index_chunks(generate_chunks(chunk_count))
+
+        # Threshold -1 keeps every row, so both paths build `limit` result dicts
+        for limit in limits:
+            for name, search in (
+                ("legacy", lambda q: legacy_search_similar(indexer, q, limit, -1.0)),
+                ("vectorized", lambda q: indexer.search_similar(q, limit=limit, threshold=-1.0)),
+            ):
+                search("warm up")
+                samples = []
+                for i in range(queries):
+                    start = time.perf_counter()
+                    results = search(f"query {i}")
+                    samples.append(time.perf_counter() - start)
+                print(
+                    f"limit={limit:<5} {name:<10} results={len(results):<5} "
+                    f"p50={percentile(samples, 0.5) * 1000:.1f}ms p99={percentile(samples, 0.99) * 1000:.1f}ms"
+                )
+
+
+def bench_keyword(sizes=(2000, 8000, 32000), queries: int = 30):
+    """Compare keyword search latency of a LIKE scan against the BM25 full-text index"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: search_by_keyword, {queries} queries per size")
+    print("=" * 60)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as db_path:
+            indexer = CodeIndexer(db_path=db_path, embeddings=FakeEmbeddings(), use_cache=False)
+            with quiet():
+                indexer.index_chunks(generate_chunks(size))
+            keywords = [f"Component{random.randrange(size)}" for _ in range(queries)]
+            for name, search in (
+                (
+                    "like",
+                    lambda kw: indexer.table.search()
+                    .where(f"code LIKE '%{kw}%' OR chunk_name LIKE '%{kw}%'")
+                    .select(["id"])
+                    .limit(10)
+                    .to_arrow(),
+                ),
+                ("bm25", lambda kw: indexer.search_by_keyword(kw, limit=10)),
+            ):
+                search(keywords[0])
+                samples = []
+                for keyword in keywords:
+                    start = time.perf_counter()
+                    search(keyword)
+                    samples.append(time.perf_counter() - start)
+                print(
+                    f"rows={size:<6} {name:<5} p50={percentile(samples, 0.5) * 1000:.1f}ms "
+                    f"p99={percentile(samples, 0.99) * 1000:.1f}ms"
+                )
+
+
+def bench_hybrid(chunk_count: int = 20_000, queries: int = 30, latency: float = 0.05):
+    """Compare hybrid search latency with its semantic and keyword legs run on their own"""
+    from code_indexer import CodeIndexer
+
+    print(
+        f"Benchmark: search_hybrid, {chunk_count} chunks, {queries} queries, "
+        f"{latency * 1000:.0f}ms per query embedding"
+    )
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as db_path:
+        embeddings = FakeEmbeddings()
+        indexer = CodeIndexer(db_path=db_path, embeddings=embeddings, use_cache=False, query_cache_size=0)
+        with quiet():
+            indexer.index_chunks(generate_chunks(chunk_count))
+        embeddings.latency = latency
+
+        for name, search in (
+            # The legs fetch 2 * limit candidates each, as search_hybrid does
+            ("semantic", lambda q: indexer.search_similar(q, limit=20, threshold=0.0)),
+            ("keyword", lambda q: indexer.search_by_keyword(q, limit=20)),
+            (
+                "sequential",
+                lambda q: (
+                    indexer.search_similar(q, limit=20, threshold=0.0),
+                    indexer.search_by_keyword(q, limit=20),
+                ),
+            ),
+            ("hybrid", lambda q: indexer.search_hybrid(q)),
+        ):
+            search("Component1 render")
+            samples = []
+            for i in range(queries):
+                start = time.perf_counter()
+                search(f"Component{random.randrange(chunk_count)} render item")
+                samples.append(time.perf_counter() - start)
+            print(
+                f"{name:<10} p50={percentile(samples, 0.5) * 1000:.1f}ms "
+                f"p99={percentile(samples, 0.99) * 1000:.1f}ms"
+            )
+
+
+def legacy_get_stats(indexer):
+    """The previous get_stats, which loaded the whole table into pandas"""
+    df = indexer.table.to_pandas()
+    return {
+        "total_chunks": len(indexer.table),
+        "chunk_types": df["chunk_type"].value_counts().to_dict(),
+        "files": df["file_name"].value_counts().to_dict(),
+    }
+
+
+def bench_stats(chunk_count: int = 20_000):
+    """Compare get_stats time and data read: whole-table pandas, column projection, cached"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: get_stats, {chunk_count} chunks")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as db_path:
+        indexer = CodeIndexer(db_path=db_path, embeddings=FakeEmbeddings(), use_cache=False)
+        with quiet():
+            indexer.index_chunks(generate_chunks(chunk_count))
+
+        def projected():
+            indexer._stats = None
+            return indexer.get_stats()
+
+        for name, fn, columns in (
+            ("to_pandas", lambda: legacy_get_stats(indexer), None),
+            ("projected", projected, ["chunk_type", "node_type", "file_name", "total_parts"]),
+            ("cached", indexer.get_stats, []),
+        ):
+            elapsed, _, _, _ = measure(fn)
+            if columns is None:
+                materialized = indexer.table.to_arrow().nbytes
+            else:
+                materialized = indexer.table.search().select(columns).to_arrow().nbytes if columns else 0
+            print(f"{name:<10} time={elapsed * 1000:.1f}ms materialized={materialized / 2**20:.1f}MiB")
+        expected = legacy_get_stats(indexer)
+        stats = indexer.get_stats()
+        print(
+            "identical:",
+            all(stats[key] == expected[key] for key in ("total_chunks", "chunk_types", "files")),
+        )
+
+
+def bench_upsert(chunk_count: int = 20_000, batch_size: int = 64):
+    """Measure write throughput of append vs merge-insert upsert, fresh and overwriting"""
+    import lancedb
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: table writes, {chunk_count} rows")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with quiet():
+            # Warm the embedding cache (kept next to the database) so the timed runs measure writes
+            CodeIndexer(db_path=f"{tmp_dir}/source", embeddings=FakeEmbeddings()).index_chunks(
+                generate_chunks(chunk_count)
+            )
+            shutil.rmtree(f"{tmp_dir}/source")
+            indexer = CodeIndexer(db_path=f"{tmp_dir}/source", embeddings=FakeEmbeddings())
+            timings = []
+            for _ in range(2):
+                start = time.perf_counter()
+                indexed = indexer.index_chunks(generate_chunks(chunk_count))
+                timings.append(time.perf_counter() - start)
+        for name, elapsed in zip(("fresh", "overwrite"), timings):
+            print(f"index_chunks {name:<9} time={elapsed:.2f}s rows/s={indexed / elapsed:.0f}")
+        print(f"rows after indexing twice: {indexer.table.count_rows()} (no duplicates)")
+
+        data = indexer.table.to_arrow()
+
+        def batches(size):
+            return [data.slice(start, size) for start in range(0, data.num_rows, size)]
+
+        def append(table, size):
+            for batch in batches(size):
+                table.add(batch)
+
+        def upsert(table, size):
+            for batch in batches(size):
+                table.merge_insert("id").when_matched_update_all().when_not_matched_insert_all().execute(batch)
+
+        db = lancedb.connect(f"{tmp_dir}/writes")
+        for name, write, size, reuse in (
+            ("append fresh", append, batch_size, False),
+            ("upsert fresh", upsert, batch_size, False),
+            ("upsert overwrite", upsert, batch_size, True),
+            ("upsert overwrite", upsert, indexer.write_batch_size, True),
+        ):
+            if not reuse:
+                table = db.create_table("code_chunks", schema=data.schema, mode="overwrite")
+            start = time.perf_counter()
+            write(table, size)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<17} batch={size:<4} time={elapsed:.2f}s rows/s={data.num_rows / elapsed:.0f} "
+                f"rows={table.count_rows()}"
+            )
+
+
+def bench_optimize(chunk_count: int = 20_000, write_batch_size: int = 64, queries: int = 30):
+    """Compare fragments, versions and query/scan latency before and after CodeIndexer.optimize"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: optimize, {chunk_count} chunks written {write_batch_size} rows at a time")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as db_path:
+        indexer = CodeIndexer(
+            db_path=db_path, embeddings=FakeEmbeddings(), use_cache=False, write_batch_size=write_batch_size
+        )
+        with quiet():
+            indexer.index_chunks(generate_chunks(chunk_count), batch_size=write_batch_size)
+            # Re-index a tenth of the chunks, as edits would, leaving deleted rows behind
+            indexer.index_chunks(generate_chunks(chunk_count // 10), batch_size=write_batch_size)
+
+        def latencies():
+            timings = {}
+            for name, fn in (
+                ("search", lambda i: indexer.search_similar(f"query {i}", limit=10)),
+                ("filtered search", lambda i: indexer.search_similar(f"query {i}", limit=10, chunk_type="function")),
+                ("scan stats", lambda i: indexer._compute_stats()),
+            ):
+                fn(-1)
+                samples = []
+                for i in range(queries):
+                    start = time.perf_counter()
+                    fn(i)
+                    samples.append(time.perf_counter() - start)
+                timings[name] = percentile(samples, 0.5) * 1000
+            return timings
+
+        before = latencies()
+        report = indexer.optimize(retention_days=0)
+        after = latencies()
+        print(f"optimize time={report['elapsed']:.2f}s")
+        print(f"{'':<24}{'before':>12}{'after':>12}")
+        for key in ("rows", "fragments", "small_fragments", "versions", "bytes"):
+            print(f"{key:<24}{report['before'][key]:>12}{report['after'][key]:>12}")
+        for name in before:
+            print(f"{name + ' p50 ms':<24}{before[name]:>12.1f}{after[name]:>12.1f}")
+
+
+class ClusteredEmbeddings(FakeEmbeddings):
+    """
+    FakeEmbeddings scattered around a fixed set of topic centroids, so nearest neighbours have
+    the structure real embeddings have (uniformly random vectors have none).
+    """
+
+    def __init__(self, clusters: int = 256, spread: float = 0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.spread = spread
+        rng = np.random.default_rng(0)
+        self.centroids = rng.standard_normal((clusters, self.dimension)).astype(np.float32)
+        self.centroids /= np.linalg.norm(self.centroids, axis=1, keepdims=True)
+
+    def _embed(self, text):
+        noise = np.asarray(super()._embed(text), dtype=np.float32)
+        topic = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little")
+        centroid = self.centroids[topic % len(self.centroids)]
+        vector = centroid + self.spread * noise
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+def bench_ann(chunk_count: int = 20_000, queries: int = 50, limit: int = 10):
+    """Measure recall@limit and latency of the IVF-PQ index against exact search"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: IVF-PQ index, {chunk_count} chunks, {queries} queries, recall@{limit}")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as db_path:
+        indexer = CodeIndexer(db_path=db_path, embeddings=ClusteredEmbeddings(), use_cache=False)
+        with quiet():
+            indexer.index_chunks(generate_chunks(chunk_count))
+
+        query_texts = [f"query {i}" for i in range(queries)]
+        samples, exact = [], []
+        for text in query_texts:
+            start = time.perf_counter()
+            results = indexer.search_similar(text, limit=limit, threshold=-1.0)
+            samples.append(time.perf_counter() - start)
+            exact.append({result["id"] for result in results})
+        print(f"exact                    p50={percentile(samples, 0.5) * 1000:.1f}ms recall=1.000")
+
+        start = time.perf_counter()
+        indexer.build_vector_index()
+        print(f"build time={time.perf_counter() - start:.1f}s")
+        for nprobes in (1, 5, 20, 50):
+            for refine_factor in (None, 10):
+                samples, hits = [], 0
+                for text, expected in zip(query_texts, exact):
+                    start = time.perf_counter()
+                    results = indexer.search_similar(
+                        text, limit=limit, threshold=-1.0, nprobes=nprobes, refine_factor=refine_factor
+                    )
+                    samples.append(time.perf_counter() - start)
+                    hits += len(expected & {result["id"] for result in results})
+                print(
+                    f"nprobes={nprobes:<3} refine={str(refine_factor):<5} "
+                    f"p50={percentile(samples, 0.5) * 1000:.1f}ms recall={hits / (limit * queries):.3f}"
+                )
+
+
+def bench_formats(chunk_count: int = 20_000, queries: int = 50, limit: int = 10):
+    """Compare table size, latency and recall@limit of each embedding storage format"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: vector formats, {chunk_count} chunks, {queries} queries, recall@{limit}")
+    print("=" * 60)
+    query_texts = [f"query {i}" for i in range(queries)]
+    exact = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for vector_format in VECTOR_FORMATS:
+            with quiet():
+                indexer = CodeIndexer(
+                    db_path=f"{tmp_dir}/{vector_format}",
+                    embeddings=ClusteredEmbeddings(),
+                    vector_format=vector_format,
+                    use_cache=False,
+                )
+                indexer.index_chunks(generate_chunks(chunk_count))
+                indexer.optimize()
+            vector_bytes = sum(
+                field.type.list_size * field.type.value_type.bit_width // 8
+                for field in indexer.table.schema
+                if field.name.startswith("embedding")
+            )
+            table_bytes = indexer.table.stats()["total_bytes"]
+            refine_factors = (1, 4, 10) if vector_format == "binary" else (None,)
+            for refine_factor in refine_factors:
+                samples, found = [], []
+                for text in query_texts:
+                    start = time.perf_counter()
+                    results = indexer.search_similar(text, limit=limit, threshold=-1.0, refine_factor=refine_factor)
+                    samples.append(time.perf_counter() - start)
+                    found.append({result["id"] for result in results})
+                if exact is None:
+                    exact = found
+                hits = sum(len(expected & ids) for expected, ids in zip(exact, found))
+                name = vector_format + (f" rescore x{refine_factor}" if refine_factor else "")
+                print(
+                    f"{name:<19} vector={vector_bytes:>5}B/row table={table_bytes / 2**20:6.1f}MiB "
+                    f"p50={percentile(samples, 0.5) * 1000:6.1f}ms recall={hits / (limit * queries):.3f}"
+                )
+
+
+def bench_matryoshka(
+    chunk_count: int = 20_000, queries: int = 50, limit: int = 10, short_dimensions=(64, 128, 256, 512)
+):
+    """Measure recall@limit and latency of two-stage search on truncated embeddings against exact search"""
+    from code_indexer import CodeIndexer
+
+    print(f"Benchmark: two-stage search, {chunk_count} chunks, {queries} queries, recall@{limit}")
+    print("=" * 60)
+    query_texts = [f"query {i}" for i in range(queries)]
+
+    def run(indexer, refine_factor=None):
+        samples, found = [], []
+        for text in query_texts:
+            start = time.perf_counter()
+            results = indexer.search_similar(text, limit=limit, threshold=-1.0, refine_factor=refine_factor)
+            samples.append(time.perf_counter() - start)
+            found.append({result["id"] for result in results})
+        return percentile(samples, 0.5) * 1000, found
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        exact = None
+        for short_dimension in (None,) + tuple(short_dimensions):
+            with quiet():
+                indexer = CodeIndexer(
+                    db_path=f"{tmp_dir}/{short_dimension}",
+                    embeddings=ClusteredEmbeddings(),
+                    short_dimension=short_dimension,
+                    use_cache=False,
+                )
+                indexer.index_chunks(generate_chunks(chunk_count))
+                indexer.optimize()
+            if short_dimension is None:
+                p50, exact = run(indexer)
+                print(f"exact 1536 dims           p50={p50:6.1f}ms recall=1.000")
+                continue
+            for indexed in (False, True):
+                if indexed:
+                    with quiet():
+                        indexer.build_vector_index()
+                for refine_factor in (1, 2, 5, 10, 20):
+                    p50, found = run(indexer, refine_factor)
+                    hits = sum(len(expected & ids) for expected, ids in zip(exact, found))
+                    name = f"{short_dimension} dims{' IVF-PQ' if indexed else ''} x{refine_factor}"
+                    print(f"{name:<25} p50={p50:6.1f}ms recall={hits / (limit * queries):.3f}")
+
+
+def main():
+    """Main function"""
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  python benchmark.py index [chunk_count] [latency_seconds]")
+        print("  python benchmark.py chunk [src_path] [copies]")
+        print("  python benchmark.py scan [src_path] [line_count]")
+        print("  python benchmark.py blocks")
+        print("  python benchmark.py ingest [src_path] [copies]")
+        print("  python benchmark.py stream [src_path]")
+        print("  python benchmark.py search [chunk_count] [queries]")
+        print("  python benchmark.py ann [chunk_count] [queries]")
+        print("  python benchmark.py keyword")
+        print("  python benchmark.py stats [chunk_count]")
+        print("  python benchmark.py upsert [chunk_count]")
+        print("  python benchmark.py optimize [chunk_count]")
+        print("  python benchmark.py embedders [chunk_count]")
+        print("  python benchmark.py formats [chunk_count] [queries]")
+        print("  python benchmark.py matryoshka [chunk_count] [queries]")
+        print("  python benchmark.py hybrid [chunk_count] [queries]")
+        print("  python benchmark.py cache [chunk_count] [latency_seconds]")
+        print("  python benchmark.py schedule [batch_count] [latency_seconds] [error_rate]")
+        return
+
+    command = sys.argv[1]
+
+    if command == "index":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+        bench_index(chunk_count, latency)
+    elif command == "chunk":
+        src_path = sys.argv[2] if len(sys.argv) > 2 else "src"
+        copies = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        bench_chunk(src_path, copies)
+    elif command == "scan":
+        src_path = sys.argv[2] if len(sys.argv) > 2 else "src"
+        line_count = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+        bench_scan(src_path, line_count)
+    elif command == "blocks":
+        bench_blocks()
+    elif command == "ingest":
+        src_path = sys.argv[2] if len(sys.argv) > 2 else "src"
+        copies = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        bench_ingest(src_path, copies)
+    elif command == "stream":
+        bench_stream(sys.argv[2] if len(sys.argv) > 2 else "src")
+    elif command == "search":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+        queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        bench_search(chunk_count, queries)
+    elif command == "ann":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+        queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        bench_ann(chunk_count, queries)
+    elif command == "keyword":
+        bench_keyword()
+    elif command == "hybrid":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+        queries = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+        bench_hybrid(chunk_count, queries)
+    elif command == "stats":
+        bench_stats(int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
+    elif command == "upsert":
+        bench_upsert(int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
+    elif command == "optimize":
+        bench_optimize(int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
+    elif command == "embedders":
+        bench_embedders(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+    elif command == "formats":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+        queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        bench_formats(chunk_count, queries)
+    elif command == "matryoshka":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+        queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        bench_matryoshka(chunk_count, queries)
+    elif command == "cache":
+        chunk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+        bench_cache(chunk_count, latency)
+    elif command == "schedule":
+        batch_count = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+        latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+        error_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.2
+        bench_schedule(batch_count, latency, error_rate)
+    else:
+        print(f"Unknown command: {command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,231 @@
 
-import os
-from typing import List, Dict, Any, Optional
+import ast
+import itertools
+import math
+import queue
+import random
+import threading
+import time
+import warnings
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple, Union
 
 import lancedb
 import numpy as np
 import pyarrow as pa
-from langchain_openai import OpenAIEmbeddings
+import pyarrow.compute as pc
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from lancedb.index import FTS, Bitmap, BTree, IvfFlat, IvfPq
 
+from code_tokenizer import keyword_text, tokenize_code
+from embedders import DEFAULT_EMBEDDER, create_embeddings, embedding_dimension
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from vector_formats import (
+    DEFAULT_VECTOR_FORMAT,
+    cosine_similarity,
+    encode_vectors,
+    fixed_size_list_to_numpy,
+    quantize_binary,
+    schema_dimension,
+    schema_short_dimension,
+    schema_vector_format,
+    truncate_vectors,
+    vector_fields,
+)
+
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# IVF-PQ trains 256 centroids per sub-vector, so smaller tables are searched exhaustively
+VECTOR_INDEX_MIN_ROWS = 256
+# Reciprocal rank fusion constant from Cormack et al.; damps the weight of the very top ranks
+RRF_K = 60
+# PQ codes alone cannot rank near-duplicate neighbours; re-ranking 10x candidates exactly restores recall
+DEFAULT_REFINE_FACTOR = 10
+# search_similar threshold for embedders that do not set their own `similarity_threshold`
+DEFAULT_SIMILARITY_THRESHOLD = 0.7
+# Metadata on the `id` field of tables whose ids are known to be unique (see _migrate_table)
+UNIQUE_IDS_METADATA = {"unique": "true"}
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """
+    Return True for errors worth retrying: rate limits, timeouts and 5xx responses.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status in TRANSIENT_STATUS_CODES:
+        return True
+    return type(error).__name__ in {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+def _sql_quote(value: str) -> str:
+    """
+    Quote a string literal for a LanceDB filter expression.
+    """
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _like_pattern(text: str, prefix: bool = False) -> str:
+    """
+    Escape LIKE wildcards in text; with prefix, match anything starting with it.
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%" if prefix else escaped
+
+
+def _path_pattern(file_path: str) -> str:
+    """
+    Translate a file path prefix or glob into a LIKE pattern. In a glob, `*` matches any run of
+    characters (including `/`) and `?` a single character; anything else is a path prefix.
+    """
+    if file_path.startswith("./"):
+        file_path = file_path[2:]
+    if "*" in file_path or "?" in file_path:
+        return _like_pattern(file_path).replace("*", "%").replace("?", "_")
+    return _like_pattern(file_path, prefix=True)
+
+
+def _build_filter(
+    chunk_type: Optional[Union[str, Sequence[str]]] = None,
+    file_path: Optional[str] = None,
+    line_range: Optional[Tuple[int, int]] = None,
+    node_type: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Build a LanceDB filter from search filters, or None when no filter is set.
+    line_range keeps chunks overlapping the (first, last) line range.
+    """
+    clauses = []
+    if chunk_type:
+        types = [chunk_type] if isinstance(chunk_type, str) else list(chunk_type)
+        clauses.append(f"chunk_type IN ({', '.join(_sql_quote(t) for t in types)})")
+    if file_path:
+        clauses.append(f"file_path LIKE {_sql_quote(_path_pattern(file_path))}")
+    if line_range:
+        first, last = line_range
+        clauses.append(f"start_line <= {int(last)} AND end_line >= {int(first)}")
+    if node_type:
+        clauses.append(f"node_type = {_sql_quote(node_type)}")
+    return " AND ".join(f"({clause})" for clause in clauses) or None
+
+
+class RateLimiter:
+    """
+    RateLimiter enforces requests-per-minute and tokens-per-minute budgets over a sliding 60s window.
+    A budget of None means unlimited.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window: deque = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        """
+        Block until a request of `tokens` tokens fits in both budgets, then record it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= 60.0:
+                    self._tokens_in_window -= self._window.popleft()[1]
+                fits_requests = (
+                    self.requests_per_minute is None or len(self._window) < self.requests_per_minute
+                )
+                # A single request larger than the token budget is let through on an empty window
+                fits_tokens = (
+                    self.tokens_per_minute is None
+                    or not self._window
+                    or self._tokens_in_window + tokens <= self.tokens_per_minute
+                )
+                if fits_requests and fits_tokens:
+                    self._window.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = 60.0 - (now - self._window[0][0])
+            time.sleep(max(wait, 0.01))
+
+
+class EmbeddingScheduler:
+    """
+    EmbeddingScheduler keeps up to `max_in_flight` embed_documents batches running on a thread pool.
+    Each batch waits for the rate limiter, and transient errors (429, timeouts, 5xx) are retried with
+    exponential backoff and jitter. Futures are returned per batch, so callers consume results in
+    submission order regardless of completion order.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        max_in_flight: int = 4,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 6,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        self.embeddings = embeddings
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def estimate_tokens(texts: List[str]) -> int:
+        """
+        Rough token count (~4 characters per token) used for the tokens-per-minute budget.
+        """
+        return sum(len(text) // 4 + 1 for text in texts)
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Schedule a batch for embedding and return a Future with its vectors.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_in_flight, thread_name_prefix="embedding"
+            )
+        return self._executor.submit(self._embed_with_retry, texts)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch synchronously, with rate limiting and retries.
+        """
+        return self._embed_with_retry(texts)
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        tokens = self.estimate_tokens(texts)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(tokens)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_transient_error(e):
+                    raise
+                delay = getattr(e, "retry_after", None) or min(
+                    self.backoff_max, self.backoff_base * (2 ** attempt)
+                )
+                attempt += 1
+                self.retries += 1
+                time.sleep(delay * (0.5 + random.random() / 2))
+
+    def close(self) -> None:
+        """
+        Shut down the worker threads.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
 
 
 class CodeIndexer:
@@ -16,48 +234,227 @@ class CodeIndexer:
     It supports chunk splitting, embedding, and semantic/keyword search.
     """
 
-    def __init__(self, db_path: str = "code_database", openai_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: str = "code_database",
+        openai_api_key: Optional[str] = None,
+        embeddings: Optional[Any] = None,
+        embedder: Optional[str] = None,
+        vector_format: Optional[str] = None,
+        short_dimension: Optional[int] = None,
+        batch_size: int = 64,
+        max_in_flight: int = 4,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        use_cache: bool = True,
+        cache_max_entries: int = 100_000,
+        reindex_fraction: float = 0.2,
+        write_batch_size: int = 512,
+        read_consistency_interval: Optional[float] = None,
+        query_cache_size: int = 1024,
+        query_cache_ttl: Optional[float] = 3600.0,
+    ):
         """
-        Initialize the code indexer with LanceDB and OpenAI embeddings.
+        Initialize the code indexer with LanceDB and the `embedder` named embedding backend
+        ("openai" or the local "hashing", see create_embeddings). An existing table keeps the
+        embedder it was built with unless one is named; a new table defaults to "openai".
+        Any object exposing embed_documents/embed_query (e.g. FakeEmbeddings) can be passed
+        as `embeddings` instead. The embedding column is sized to the embedder's dimension, and
+        opening a table built with a different dimension raises ValueError.
+        `vector_format` ("float32", "float16", "int8" or "binary", see vector_formats) sets how a
+        new table stores embeddings; an existing table keeps its format.
+        With `short_dimension` (e.g. 256), a new float32/float16 table also stores that many
+        leading dimensions of every embedding, and search_similar runs a two-stage search on them
+        (see _search_two_stage). This suits Matryoshka-trained models such as text-embedding-3-*.
+        `batch_size` is the number of code parts embedded and written per round trip in index_chunks.
+        Up to `max_in_flight` batches are embedded concurrently within the given requests/tokens
+        per minute budgets. Unless `use_cache`
+        is False, embeddings are cached on disk next to the database (see EmbeddingCache).
+        Embedded batches are written in groups of at least `write_batch_size` records.
+        Once a vector index exists, it is rebuilt after a write leaves more than
+        `reindex_fraction` of the indexed row count unindexed (see build_vector_index).
+        A long-lived reader (e.g. the search server) sets `read_consistency_interval` (seconds)
+        to pick up writes made by other processes at most that long after they land.
+        Query embeddings are kept in an LRU cache of `query_cache_size` entries that expire after
+        `query_cache_ttl` seconds, backed by the on-disk cache (0 disables it).
         """
         self.db_path = db_path
-        self.db = lancedb.connect(db_path)
+        self.db = lancedb.connect(
+            db_path,
+            read_consistency_interval=(
+                timedelta(seconds=read_consistency_interval) if read_consistency_interval is not None else None
+            ),
+        )
+        self.batch_size = batch_size
+        self.write_batch_size = max(1, write_batch_size)
+        self.reindex_fraction = reindex_fraction
 
-        if openai_api_key:
-            os.environ["OPENAI_API_KEY"] = openai_api_key
-        self.embeddings = OpenAIEmbeddings()
+        table = self._open_table()
+        if embeddings is None:
+            embedder = embedder or self._table_metadata(table).get("embedder") or DEFAULT_EMBEDDER
+            embeddings = create_embeddings(embedder, openai_api_key=openai_api_key)
+        self.embeddings = embeddings
+        self.embedder = embedder
+        self.dimension = embedding_dimension(self.embeddings)
+        # Similarity scales differ between embedders: OpenAI cosine scores of related code sit
+        # around 0.7-0.9, lexical hashing scores far lower
+        self.similarity_threshold = getattr(
+            self.embeddings, "similarity_threshold", DEFAULT_SIMILARITY_THRESHOLD
+        )
+        self.scheduler = EmbeddingScheduler(
+            self.embeddings,
+            max_in_flight=max_in_flight,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        self.embedding_model = getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+        self.cache = (
+            EmbeddingCache(f"{db_path.rstrip('/')}_embedding_cache.sqlite", max_entries=cache_max_entries)
+            if use_cache
+            else None
+        )
+        self.query_cache = (
+            QueryEmbeddingCache(
+                self.embedding_model, max_entries=query_cache_size, ttl=query_cache_ttl, disk=self.cache
+            )
+            if query_cache_size
+            else None
+        )
 
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", " ", ""]
         )
-        self.table = self._get_or_create_table()
+        table_format = schema_vector_format(table.schema) if table is not None else None
+        self.vector_format = vector_format or table_format or DEFAULT_VECTOR_FORMAT
+        table_short_dimension = schema_short_dimension(table.schema) if table is not None else None
+        self.short_dimension = short_dimension or table_short_dimension
+        if table is None:
+            print("Creating new table: code_chunks")
+            table = self.db.create_table("code_chunks", schema=self._table_schema())
+        else:
+            print("Using existing table: code_chunks")
+            table_dimension = schema_dimension(table.schema)
+            if table_dimension != self.dimension:
+                raise ValueError(
+                    f"code_chunks at {db_path} stores {table_dimension}-dimensional embeddings, but the "
+                    f"{self.embedding_model} embedder produces {self.dimension}; use its own db_path"
+                )
+            if table_format != self.vector_format:
+                raise ValueError(
+                    f"code_chunks at {db_path} stores {table_format} embeddings, not {self.vector_format}; "
+                    f"use its own db_path"
+                )
+            if table_short_dimension != self.short_dimension:
+                raise ValueError(
+                    f"code_chunks at {db_path} stores {table_short_dimension or 'no'}-dimensional short "
+                    f"embeddings, not {self.short_dimension}; use its own db_path"
+                )
+        self.table = table
+        self._migrate_table()
+        self._search_executor: Optional[ThreadPoolExecutor] = None
+        self._stats: Optional[Dict[str, Any]] = None
+        self._stats_version: Optional[int] = None
+        self._stats_lock = threading.Lock()
+        # Embeddings submitted but not yet cached, by cache key: (future, position in its batch)
+        self._in_flight: Dict[str, Tuple[Future, int]] = {}
+        self._in_flight_lock = threading.Lock()
+        self.embedding_counts: Counter = Counter()
+        # Files with rows that the last index_chunks run failed to write
+        self.failed_files: set = set()
 
-    def _get_or_create_table(self):
+    def _table_schema(self) -> pa.Schema:
         """
-        Get existing table or create a new one with the required schema.
+        The code_chunks schema. Its metadata records the embedder, so later runs that do not name
+        one reopen the table with the same embedder.
+        """
+        metadata = {"embedding_model": self.embedding_model}
+        if self.embedder:
+            metadata["embedder"] = self.embedder
+        return pa.schema([
+            pa.field("id", pa.string(), metadata=UNIQUE_IDS_METADATA),
+            pa.field("file_path", pa.string()),
+            pa.field("file_name", pa.string()),
+            pa.field("chunk_type", pa.string()),
+            pa.field("chunk_name", pa.string()),
+            pa.field("code", pa.string()),
+            pa.field("description", pa.string()),
+            pa.field("start_line", pa.int32()),
+            pa.field("end_line", pa.int32()),
+            pa.field("total_lines", pa.int32()),
+            pa.field("file_size", pa.int32()),
+            *vector_fields(self.vector_format, self.dimension, self.short_dimension),
+            pa.field("node_type", pa.string()),
+            pa.field("part_index", pa.int32()),
+            pa.field("total_parts", pa.int32()),
+            pa.field("keywords", pa.string()),
+        ], metadata=metadata)
+
+    def _open_table(self):
+        """
+        Open the code_chunks table, or return None if it does not exist yet.
         """
         try:
-            table = self.db.open_table("code_chunks")
-            print("Using existing table: code_chunks")
-            return table
+            return self.db.open_table("code_chunks")
         except Exception:
-            print("Creating new table: code_chunks")
-            schema = pa.schema([
-                pa.field("id", pa.string()),
-                pa.field("file_path", pa.string()),
-                pa.field("file_name", pa.string()),
-                pa.field("chunk_type", pa.string()),
-                pa.field("chunk_name", pa.string()),
-                pa.field("code", pa.string()),
-                pa.field("description", pa.string()),
-                pa.field("start_line", pa.int32()),
-                pa.field("end_line", pa.int32()),
-                pa.field("total_lines", pa.int32()),
-                pa.field("file_size", pa.int32()),
-                pa.field("embedding", pa.list_(pa.float32(), 1536)),
-                pa.field("metadata", pa.string()),
-            ])
-            return self.db.create_table("code_chunks", schema=schema)
+            return None
+
+    @staticmethod
+    def _table_metadata(table) -> Dict[str, str]:
+        if table is None or not table.schema.metadata:
+            return {}
+        return {key.decode(): value.decode() for key, value in table.schema.metadata.items()}
+
+
+    def _migrate_table(self) -> None:
+        """
+        Bring a table created by an older version up to the current schema by rewriting it once:
+        `keywords` is computed from chunk_name, code and description, and the str(dict) `metadata`
+        column is parsed into the typed node_type / part_index / total_parts columns.
+        Older versions appended re-indexed chunks instead of upserting them, so rows sharing an id
+        are collapsed to the last one written; a table with duplicate ids is rewritten even if its
+        columns are current. The check reads the whole id column, so its result is recorded in the
+        id field's metadata and later opens skip it. Indexes that existed are rebuilt afterwards.
+        """
+        schema = self._table_schema()
+        if self.table.schema.names == schema.names:
+            if self.table.schema.field("id").metadata == schema.field("id").metadata:
+                return
+            ids = self.table.search().select(["id"]).to_arrow()["id"]
+            if pc.count_distinct(ids).as_py() == len(ids):
+                self.table.update_field_metadata({"path": "id", "metadata": UNIQUE_IDS_METADATA})
+                return
+        print("Migrating code_chunks to the current schema")
+        had_vector_index = self._vector_index_name() is not None
+        data = self.table.to_arrow()
+        last_row = {chunk_id: row for row, chunk_id in enumerate(data["id"].to_pylist())}
+        if len(last_row) < len(data):
+            print(f"Dropping {len(data) - len(last_row)} duplicate rows")
+            data = data.take(sorted(last_row.values()))
+        if "keywords" not in data.column_names:
+            keywords = [
+                keyword_text(name or "", code or "", description or "")
+                for name, code, description in zip(
+                    data["chunk_name"].to_pylist(), data["code"].to_pylist(), data["description"].to_pylist()
+                )
+            ]
+            data = data.append_column("keywords", pa.array(keywords, pa.string()))
+        if "node_type" not in data.column_names:
+            metadata = []
+            for value in data["metadata"].to_pylist():
+                try:
+                    metadata.append(ast.literal_eval(value) if value else {})
+                except (ValueError, SyntaxError):
+                    metadata.append({})
+            for name, default in (("node_type", ""), ("part_index", 0), ("total_parts", 1)):
+                values = [entry.get(name, default) for entry in metadata]
+                data = data.append_column(name, pa.array(values, schema.field(name).type))
+        data = data.select(schema.names).cast(schema)
+        self.table = self.db.create_table("code_chunks", data=data, mode="overwrite")
+        if had_vector_index:
+            self.build_vector_index()
+        if len(data):
+            self.build_keyword_index()
+            self.maybe_rebuild_scalar_indexes()
 
 
     def _create_chunk_id(self, file_path: str, chunk_type: str, chunk_name: str, start_line: int) -> str:
@@ -84,7 +481,22 @@ class CodeIndexer:
             return self.embeddings.embed_query(text)
         except Exception as e:
             print(f"Error getting embedding: {e}")
-            return [0.0] * 1536
+            return [0.0] * self.dimension
+
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        """
+        Get the embedding of a search query, from the query cache when possible.
+        Failed (zero) embeddings are not cached.
+        """
+        if self.query_cache is None:
+            return self._get_embedding(query)
+        vector = self.query_cache.get(query)
+        if vector is None:
+            vector = self._get_embedding(query)
+            if any(vector):
+                self.query_cache.put(query, vector)
+        return vector
 
 
     def _generate_description(self, chunk: Dict[str, Any], code_part: str) -> str:
@@ -116,12 +528,98 @@ class CodeIndexer:
         return desc
 
 
-    def index_chunks(self, chunks: List[Dict[str, Any]]) -> int:
+    def index_chunks(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        replace_files: Optional[Sequence[str]] = None,
+    ) -> int:
         """
         Index code chunks into LanceDB with detailed description and embed the description instead of code.
+        Code parts are collected into batches of `batch_size` (defaults to self.batch_size); each batch
+        is embedded with one embed_documents call, and embedded batches are upserted by chunk id in
+        merge-inserts of at least write_batch_size rows, so re-indexing replaces rows instead of
+        duplicating them. Into an empty table, groups whose ids are new to this run are appended
+        directly, which is several times faster.
+        Descriptions found in the embedding cache are not sent to the embedding API, and identical
+        descriptions are embedded once per run (see _submit_batch); embedding_counts tallies both.
+
+        `chunks` may be a lazy iterator (e.g. chunker.iter_chunks): the calling thread builds and
+        submits batches while a writer thread waits for their embeddings and writes them, connected
+        by a queue bounded to the scheduler's in-flight limit. Chunking, embedding and writing
+        therefore overlap and memory stays bounded by a few batches.
+        Chunk ids include the start line, so an edit that shifts lines gives a chunk a new id. When
+        the caller re-chunks whole files, it passes them as `replace_files`: afterwards, every row
+        of those files whose id this run did not produce is deleted. The table stays searchable
+        throughout, unlike deleting the files' rows up front.
+        A failed write is logged and its files are collected in `failed_files`; their existing rows
+        are left in place, so callers can retry them later (e.g. by not recording them in a manifest).
         Returns the number of successfully indexed chunks.
         """
-        indexed_count = 0
+        batch_size = max(1, batch_size or self.batch_size)
+        if self.cache is not None:
+            self.cache.reset_counters()
+        self.embedding_counts = Counter()
+        self.failed_files = set()
+        pending: queue.Queue = queue.Queue(maxsize=self.scheduler.max_in_flight)
+        indexed = [0]
+        errors: List[Exception] = []
+        fresh_ids = set() if self.table.count_rows() == 0 else None
+        writer = threading.Thread(
+            target=self._write_batches,
+            args=(pending, indexed, fresh_ids, errors),
+            name="index-writer",
+            daemon=True,
+        )
+        writer.start()
+        try:
+            # Stop chunking and embedding once the writer has failed
+            submitted_ids = self._submit_chunks(itertools.takewhile(lambda _: not errors, chunks), batch_size, pending)
+        finally:
+            pending.put(None)
+            writer.join()
+        if errors:
+            with self._in_flight_lock:
+                # Batches the writer skipped never release their in-flight keys
+                self._in_flight.clear()
+            raise errors[0]
+        indexed_count = indexed[0]
+        print(f"Successfully indexed {indexed_count} chunks")
+        if replace_files is not None:
+            removed = self._delete_rows_not_in(
+                [path for path in replace_files if path not in self.failed_files], submitted_ids
+            )
+            if removed:
+                print(f"Removed {removed} rows of chunks that no longer exist")
+        if indexed_count:
+            version = self.table.version
+            self.maybe_rebuild_vector_index()
+            self.maybe_rebuild_keyword_index()
+            self.maybe_rebuild_scalar_indexes()
+            with self._stats_lock:
+                # Index builds add table versions without changing any rows
+                if self._stats_version == version:
+                    self._stats_version = self.table.version
+        if self.cache is not None:
+            print(f"Embedding cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        counts = self.embedding_counts
+        if counts["parts"]:
+            uncached = counts["parts"] - counts["cached"]
+            print(
+                f"Embeddings: {counts['parts']} code parts, {counts['cached']} from cache, "
+                f"{counts['shared']} shared with an identical description, {counts['embedded']} embedded"
+                + (f" (dedup ratio {uncached / counts['embedded']:.2f}x)" if counts["embedded"] else "")
+            )
+        return indexed_count
+
+
+    def _submit_chunks(self, chunks: Iterable[Dict[str, Any]], batch_size: int, pending: queue.Queue) -> set:
+        """
+        Build records for every code part, batch them and queue each submitted batch for writing.
+        Returns the ids of all records submitted.
+        """
+        batch: List[Dict[str, Any]] = []
+        submitted_ids = set()
         for chunk in chunks:
             code_parts = self._split_long_code(chunk["code"])
             for i, code_part in enumerate(code_parts):
@@ -133,14 +631,9 @@ class CodeIndexer:
                 )
                 if len(code_parts) > 1:
                     chunk_id += f":part_{i}"
+                submitted_ids.add(chunk_id)
                 description = self._generate_description(chunk, code_part)
-                embedding = self._get_embedding(description)
-                metadata = {
-                    "node_type": chunk.get("node_type", ""),
-                    "part_index": i,
-                    "total_parts": len(code_parts),
-                }
-                record = {
+                batch.append({
                     "id": chunk_id,
                     "file_path": chunk["file_path"],
                     "file_name": chunk["file_name"],
@@ -152,77 +645,675 @@ class CodeIndexer:
                     "end_line": chunk["end_line"],
                     "total_lines": chunk["total_lines"],
                     "file_size": chunk["file_size"],
-                    "embedding": embedding,
-                    "metadata": str(metadata),
-                }
+                    "embedding": None,
+                    "node_type": chunk.get("node_type", ""),
+                    "part_index": i,
+                    "total_parts": len(code_parts),
+                    "keywords": keyword_text(chunk.get("name", "unnamed"), code_part, description),
+                })
+                if len(batch) >= batch_size:
+                    pending.put(self._submit_batch(batch))
+                    batch = []
+        if batch:
+            pending.put(self._submit_batch(batch))
+        return submitted_ids
+
+
+    def _delete_rows_not_in(self, file_paths: Sequence[str], keep_ids: set) -> int:
+        """
+        Delete rows of the given files whose id is not in keep_ids. Returns how many were deleted.
+        """
+        stale: List[str] = []
+        file_paths = list(file_paths)
+        for start in range(0, len(file_paths), 500):
+            part = file_paths[start : start + 500]
+            ids = (
+                self.table.search()
+                .where(f"file_path IN ({', '.join(_sql_quote(path) for path in part)})")
+                .select(["id"])
+                .to_arrow()["id"]
+                .to_pylist()
+            )
+            stale.extend(chunk_id for chunk_id in ids if chunk_id not in keep_ids)
+        for start in range(0, len(stale), 500):
+            self.table.delete(f"id IN ({', '.join(_sql_quote(chunk_id) for chunk_id in stale[start : start + 500])})")
+        if stale:
+            with self._stats_lock:
+                self._stats = None
+        return len(stale)
+
+
+    def _write_batches(
+        self, pending: queue.Queue, indexed: List[int], fresh_ids: Optional[set], errors: List[Exception]
+    ) -> None:
+        """
+        Writer thread: wait for queued batches in submission order until the None sentinel and
+        write them in groups of at least `write_batch_size` records, since each merge-insert
+        scans the table's ids once regardless of how many rows it carries.
+        An exception is appended to `errors` for index_chunks to raise; the queue is still drained
+        up to the sentinel so the submitting thread never blocks on it.
+        """
+        buffered: List[Dict[str, Any]] = []
+        while True:
+            item = pending.get()
+            if not errors:
                 try:
-                    self.table.add([record])
-                    indexed_count += 1
+                    if item is not None:
+                        buffered.extend(self._embed_batch(*item))
+                    if buffered and (item is None or len(buffered) >= self.write_batch_size):
+                        indexed[0] += self._write_records(buffered, fresh_ids)
+                        buffered = []
                 except Exception as e:
-                    print(f"Error indexing chunk {chunk_id}: {e}")
-        print(f"Successfully indexed {indexed_count} chunks")
-        return indexed_count
+                    errors.append(e)
+            if item is None:
+                return
 
 
-    def search_similar(self, query: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+    def _submit_batch(self, records: List[Dict[str, Any]]):
         """
-        Search for similar code chunks using semantic search.
-        Returns a list of result dicts with similarity scores.
+        Resolve a batch of records against the embedding cache and schedule embedding of the misses.
+        Every distinct description is embedded once: repeats within the batch, and descriptions an
+        earlier batch has submitted but not yet cached, share that one embedding.
+        Returns (records, keys, cached, sources, future) for _embed_batch, where sources maps each
+        uncached key to (future, position); future is this batch's own submission, or None.
         """
-        query_embedding = self._get_embedding(query)
-        results = (
-            self.table.search(query_embedding, vector_column_name="embedding")
-            .limit(limit)
-            .to_pandas()
+        keys = [EmbeddingCache.make_key(self.embedding_model, record["description"]) for record in records]
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+        sources: Dict[str, Tuple[Optional[Future], int]] = {}
+        missing: List[str] = []
+        counts = self.embedding_counts
+        with self._in_flight_lock:
+            for record, key in zip(records, keys):
+                if key in cached:
+                    counts["cached"] += 1
+                elif key in sources or key in self._in_flight:
+                    counts["shared"] += 1
+                    sources.setdefault(key, self._in_flight.get(key))
+                else:
+                    sources[key] = (None, len(missing))
+                    missing.append(record["description"])
+            future = self.scheduler.submit(missing) if missing else None
+            for key, (source, position) in sources.items():
+                if source is None:
+                    sources[key] = (future, position)
+                    self._in_flight[key] = (future, position)
+        counts["parts"] += len(records)
+        counts["embedded"] += len(missing)
+        return records, keys, cached, sources, future
+
+
+    def _embed_batch(
+        self,
+        records: List[Dict[str, Any]],
+        keys: List[str],
+        cached: Dict[str, List[float]],
+        sources: Dict[str, Tuple[Future, int]],
+        future: Optional[Future],
+    ) -> List[Dict[str, Any]]:
+        """
+        Wait for a batch's embeddings (its own and those shared from earlier batches), fill them
+        into the records and cache the ones this batch submitted. A failed embedding call leaves
+        zero vectors, which are not cached.
+        """
+        vectors = dict(cached)
+        failed = set()
+        for key, (source, position) in sources.items():
+            try:
+                vectors[key] = source.result()[position]
+            except Exception as e:
+                if source not in failed:
+                    print(f"Error getting embeddings for batch of {len(records)}: {e}")
+                    failed.add(source)
+                vectors[key] = [0.0] * self.dimension
+        own = [key for key, (source, _) in sources.items() if source is future]
+        if self.cache is not None and future is not None and future not in failed:
+            self.cache.put_many({key: vectors[key] for key in own})
+        with self._in_flight_lock:
+            for key in own:
+                self._in_flight.pop(key, None)
+        for record, key in zip(records, keys):
+            record["embedding"] = vectors[key]
+        return records
+
+
+    def _write_records(self, records: List[Dict[str, Any]], fresh_ids: Optional[set] = None) -> int:
+        """
+        Upsert records by id with a single merge-insert, so re-indexing a chunk replaces its row
+        instead of duplicating it. `fresh_ids` holds every id written so far when the table started
+        out empty; a group with none of them is appended instead.
+        Returns the number of records written.
+        """
+        # A chunk id may repeat within a batch (e.g. the same file listed twice); keep the last
+        records = list({record["id"]: record for record in records}.values())
+        ids = [record["id"] for record in records]
+        try:
+            version = self.table.version
+            data = self._records_to_arrow(records)
+            if fresh_ids is not None and fresh_ids.isdisjoint(ids):
+                self.table.add(data)
+                updated = 0
+            else:
+                result = (
+                    self.table.merge_insert("id")
+                    .when_matched_update_all()
+                    .when_not_matched_insert_all()
+                    .execute(data)
+                )
+                updated = result.num_updated_rows
+            if fresh_ids is not None:
+                fresh_ids.update(ids)
+            if updated:
+                with self._stats_lock:
+                    self._stats = None
+            else:
+                self._update_stats(records, version)
+            return len(records)
+        except Exception as e:
+            print(f"Error indexing batch starting at {records[0]['id']}: {e}")
+            self.failed_files.update(record["file_path"] for record in records)
+            return 0
+
+
+    def _records_to_arrow(self, records: List[Dict[str, Any]]) -> pa.Table:
+        """
+        Convert records to an Arrow table in the table's schema, encoding their float embeddings
+        in the table's vector format.
+        """
+        schema = self.table.schema
+        vectors = encode_vectors(
+            np.asarray([record["embedding"] for record in records], dtype=np.float32),
+            self.vector_format,
+            self.short_dimension,
+        )
+        scalar_schema = pa.schema([field for field in schema if field.name not in vectors])
+        scalars = pa.Table.from_pylist(records, schema=scalar_schema)
+        return pa.Table.from_arrays(
+            [vectors[name] if name in vectors else scalars[name] for name in schema.names], schema=schema
+        )
+
+
+    def delete_file(self, file_path: str) -> None:
+        """
+        Delete every row belonging to one file.
+        """
+        self.delete_files([file_path])
+
+
+    def delete_files(self, file_paths: List[str]) -> None:
+        """
+        Delete every row belonging to the given files.
+        """
+        for start in range(0, len(file_paths), 500):
+            part = file_paths[start : start + 500]
+            self.table.delete(f"file_path IN ({', '.join(_sql_quote(path) for path in part)})")
+
+
+    def _index_name(self, column: str) -> Optional[str]:
+        for index in self.table.list_indices():
+            if column in index.columns:
+                return index.name
+        return None
+
+
+    def _index_is_stale(self, column: str) -> bool:
+        """
+        Whether the index on column is missing or more than reindex_fraction of rows are unindexed.
+        """
+        name = self._index_name(column)
+        if name is None:
+            return True
+        stats = self.table.index_stats(name)
+        return stats.num_unindexed_rows > self.reindex_fraction * max(1, stats.num_indexed_rows)
+
+
+    @property
+    def _vector_column(self) -> str:
+        """
+        The column the vector index is built on and the first search stage runs against.
+        """
+        return "embedding_short" if self.short_dimension else "embedding"
+
+
+    def _vector_index_name(self) -> Optional[str]:
+        return self._index_name(self._vector_column)
+
+
+    def vector_index_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the embedding index type and indexed/unindexed row counts, or None without an index.
+        """
+        name = self._vector_index_name()
+        if name is None:
+            return None
+        stats = self.table.index_stats(name)
+        return {
+            "name": name,
+            "index_type": stats.index_type,
+            "distance_type": stats.distance_type,
+            "indexed_rows": stats.num_indexed_rows,
+            "unindexed_rows": stats.num_unindexed_rows,
+        }
+
+
+    def build_vector_index(
+        self, num_partitions: Optional[int] = None, num_sub_vectors: Optional[int] = None
+    ) -> bool:
+        """
+        Build (or replace) an IVF-PQ cosine index on the embedding column.
+        By default the table is split into ~sqrt(rows) partitions and each vector into
+        dimension / 16 sub-vectors (8 bytes per 128 dims of float32 input).
+        Binary embeddings get an IVF-flat hamming index instead (num_sub_vectors does not apply);
+        int8 embeddings are always scanned exactly and get no index. With short embeddings the
+        index is built on embedding_short, which the first search stage uses.
+        Returns False when no index was built, e.g. the table has fewer than VECTOR_INDEX_MIN_ROWS rows.
+        """
+        if self.vector_format == "int8":
+            print("Skipping vector index: int8 embeddings are searched by an exact scan")
+            return False
+        row_count = self.table.count_rows()
+        if row_count < VECTOR_INDEX_MIN_ROWS:
+            print(f"Skipping vector index: {row_count} rows (need at least {VECTOR_INDEX_MIN_ROWS})")
+            return False
+        dimension = self.short_dimension or self.dimension
+        if num_partitions is None:
+            num_partitions = max(1, min(4096, round(math.sqrt(row_count))))
+        start = time.perf_counter()
+        if self.vector_format == "binary":
+            self.table.create_index(
+                "embedding", config=IvfFlat(distance_type="hamming", num_partitions=num_partitions), replace=True
+            )
+            print(
+                f"Built IVF-flat hamming index on {row_count} rows ({num_partitions} partitions) "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+            return True
+        if num_sub_vectors is None:
+            num_sub_vectors = next(n for n in range(max(1, dimension // 16), 0, -1) if dimension % n == 0)
+        self.table.create_index(
+            self._vector_column,
+            config=IvfPq(distance_type="cosine", num_partitions=num_partitions, num_sub_vectors=num_sub_vectors),
+            replace=True,
+        )
+        print(
+            f"Built IVF-PQ index on {row_count} rows ({num_partitions} partitions, "
+            f"{num_sub_vectors} sub-vectors) in {time.perf_counter() - start:.1f}s"
+        )
+        return True
+
+
+    def maybe_rebuild_vector_index(self) -> bool:
+        """
+        Rebuild the vector index if one exists and too many rows have been added since it was built.
+        Returns whether a rebuild happened.
+        """
+        stats = self.vector_index_stats()
+        if stats is None or stats["unindexed_rows"] <= self.reindex_fraction * max(1, stats["indexed_rows"]):
+            return False
+        print(f"Rebuilding vector index: {stats['unindexed_rows']} unindexed rows")
+        return self.build_vector_index()
+
+
+    def _keyword_index_name(self) -> Optional[str]:
+        return self._index_name("keywords")
+
+
+    def build_keyword_index(self) -> None:
+        """
+        Build (or replace) the BM25 full-text index on the keywords column.
+        The column is already split by tokenize_code, so the index only splits on whitespace.
+        """
+        self.table.create_index(
+            "keywords",
+            config=FTS(base_tokenizer="whitespace", stem=False, remove_stop_words=False, ascii_folding=False),
+            replace=True,
         )
-        filtered_results = []
-        for _, row in results.iterrows():
-            similarity = self._cosine_similarity(query_embedding, row["embedding"])
-            if similarity >= threshold:
-                result_dict = row.to_dict()
-                result_dict["similarity"] = similarity
-                filtered_results.append(result_dict)
-        filtered_results.sort(key=lambda x: x["similarity"], reverse=True)
-        return filtered_results
 
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
+    def maybe_rebuild_keyword_index(self) -> bool:
+        """
+        Build the full-text index if it is missing, or rebuild it once more than `reindex_fraction`
+        of the rows are unindexed (those are still searched, but by a linear scan).
+        Returns whether a build happened.
+        """
+        if not self._index_is_stale("keywords"):
+            return False
+        self.build_keyword_index()
+        return True
+
+
+    def maybe_rebuild_scalar_indexes(self) -> bool:
+        """
+        Build or refresh the scalar indexes behind search filters: a bitmap on the low-cardinality
+        chunk_type and a B-tree on file_path. Same staleness rule as the full-text index.
+        Returns whether any index was built.
+        """
+        built = False
+        for column, config in (("chunk_type", Bitmap()), ("file_path", BTree())):
+            if self._index_is_stale(column):
+                self.table.create_index(column, config=config, replace=True)
+                built = True
+        return built
+
+
+    def storage_stats(self) -> Dict[str, Any]:
+        """
+        Return the table's fragment count (and how many are small), live versions and size on disk.
+        """
+        stats = self.table.stats()
+        return {
+            "rows": stats["num_rows"],
+            "fragments": stats["fragment_stats"]["num_fragments"],
+            "small_fragments": stats["fragment_stats"]["num_small_fragments"],
+            "versions": len(self.table.list_versions()),
+            "bytes": stats["total_bytes"],
+        }
+
+
+    def optimize(self, retention_days: float = 7.0) -> Dict[str, Any]:
         """
-        Calculate cosine similarity between two vectors.
+        Compact the table's fragments into larger files, fold new rows into the existing
+        indexes, delete versions older than `retention_days` (0 keeps only the latest; only
+        safe while no other process is using an older version) and rebuild any index that is
+        still stale afterwards.
+        Returns storage_stats from before and after, and the elapsed seconds.
         """
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        return float(np.dot(vec1, vec2) / (norm1 * norm2))
+        before = self.storage_stats()
+        version = self.table.version
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            # LanceDB warns about cleanup_older_than=0; the docstring already does
+            warnings.simplefilter("ignore", UserWarning)
+            self.table.optimize(cleanup_older_than=timedelta(days=retention_days))
+        self.maybe_rebuild_vector_index()
+        if self._keyword_index_name() is not None:
+            self.maybe_rebuild_keyword_index()
+        self.maybe_rebuild_scalar_indexes()
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            # Compaction rewrites files, not rows, so cached stats stay valid
+            if self._stats is not None and self._stats_version == version:
+                self._stats_version = self.table.version
+        return {"before": before, "after": self.storage_stats(), "elapsed": elapsed}
 
 
-    def search_by_keyword(self, keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def search_similar(
+        self,
+        query: str,
+        limit: int = 10,
+        threshold: Optional[float] = None,
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = DEFAULT_REFINE_FACTOR,
+        chunk_type: Optional[Union[str, Sequence[str]]] = None,
+        file_path: Optional[str] = None,
+        line_range: Optional[Tuple[int, int]] = None,
+        node_type: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
         """
-        Search for code chunks containing specific keywords in code or chunk name.
+        Search for similar code chunks using semantic search.
+        Returns a list of result dicts with similarity scores, best match first.
+        LanceDB scores the rows with cosine distance, so similarity is 1 - _distance and the
+        threshold is applied as one Arrow mask; the embedding column is not fetched. The default
+        threshold depends on the embedder (see similarity_threshold).
+        With a vector index, `nprobes` sets how many IVF partitions are searched and
+        `refine_factor` re-ranks limit * refine_factor candidates with exact distances
+        (0 or None ranks by the PQ approximation alone). Both are ignored without an index.
+        Filters (chunk_type: one type or a list; file_path: prefix or glob; line_range: (first,
+        last) overlap; node_type) are applied as a prefilter inside the vector search, so `limit`
+        results are found among matching chunks only.
+        Binary embeddings are searched by hamming distance for limit * refine_factor candidates,
+        which are rescored with their int8 codes; int8 embeddings are scanned exactly. Likewise
+        with short embeddings, limit * refine_factor candidates found by the short prefix are
+        reranked by the full embedding.
         """
-        results = (
-            self.table.search(
-                f"code LIKE '%{keyword}%' OR chunk_name LIKE '%{keyword}%'"
+        query_embedding = self._get_query_embedding(query)
+        if not np.any(query_embedding):
+            return []
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        where = _build_filter(chunk_type, file_path, line_range, node_type)
+        if self.vector_format == "int8":
+            results = self._scan_int8(query_vector, limit, where)
+        elif self.vector_format == "binary":
+            results = self._search_binary(query_vector, limit, where, nprobes, refine_factor)
+        elif self.short_dimension and np.any(query_vector[: self.short_dimension]):
+            # A query with an all-zero prefix has no direction to search by, so it skips stage one
+            results = self._search_two_stage(query_vector, limit, where, nprobes, refine_factor)
+        else:
+            search = (
+                self.table.search(query_vector, vector_column_name="embedding")
+                .distance_type("cosine")
+                .select(self._result_columns() + ["_distance"])
+                .limit(limit)
             )
+            if where:
+                search = search.where(where, prefilter=True)
+            if nprobes:
+                search = search.nprobes(nprobes)
+            if refine_factor:
+                search = search.refine_factor(refine_factor)
+            results = search.to_arrow()
+        similarity = pc.subtract(1.0, pc.cast(results["_distance"], pa.float64()))
+        if threshold is None:
+            threshold = self.similarity_threshold
+        mask = pc.greater_equal(similarity, threshold)
+        results = results.append_column("similarity", similarity).filter(mask)
+        return results.to_pylist()
+
+
+    def _search_binary(
+        self,
+        query_vector: np.ndarray,
+        limit: int,
+        where: Optional[str],
+        nprobes: Optional[int],
+        refine_factor: Optional[int],
+    ) -> pa.Table:
+        """
+        Find limit * refine_factor candidates by hamming distance between sign bits, then rank them
+        by the cosine similarity of the full-precision query with their int8 codes.
+        Returns the best `limit` rows with `_distance` set to 1 - that similarity.
+        """
+        search = (
+            self.table.search(quantize_binary(query_vector[np.newaxis])[0], vector_column_name="embedding")
+            .distance_type("hamming")
+            .select(self._result_columns() + ["embedding_int8", "_distance"])
+            .limit(limit * max(1, refine_factor or 1))
+        )
+        if where:
+            search = search.where(where, prefilter=True)
+        if nprobes:
+            search = search.nprobes(nprobes)
+        candidates = search.to_arrow()
+        similarity = cosine_similarity(query_vector, fixed_size_list_to_numpy(candidates["embedding_int8"]))
+        best = np.argsort(-similarity, kind="stable")[:limit]
+        results = candidates.drop_columns(["embedding_int8", "_distance"]).take(best)
+        return results.append_column("_distance", pa.array(1.0 - similarity[best], pa.float32()))
+
+
+    def _search_two_stage(
+        self,
+        query_vector: np.ndarray,
+        limit: int,
+        where: Optional[str],
+        nprobes: Optional[int],
+        refine_factor: Optional[int],
+    ) -> pa.Table:
+        """
+        Find limit * refine_factor candidates by cosine distance on the short prefixes (indexed
+        once build_vector_index has run), then rerank them with the full embeddings.
+        Returns the best `limit` rows with `_distance` set to 1 - full cosine similarity.
+        """
+        short_query = truncate_vectors(query_vector[np.newaxis], self.short_dimension)[0]
+        search = (
+            self.table.search(short_query, vector_column_name="embedding_short")
+            .distance_type("cosine")
+            .select(self._result_columns() + ["embedding", "_distance"])
+            .limit(limit * max(1, refine_factor or 1))
+        )
+        if where:
+            search = search.where(where, prefilter=True)
+        if nprobes:
+            search = search.nprobes(nprobes)
+        candidates = search.to_arrow()
+        similarity = cosine_similarity(query_vector, fixed_size_list_to_numpy(candidates["embedding"]))
+        best = np.argsort(-similarity, kind="stable")[:limit]
+        results = candidates.drop_columns(["embedding", "_distance"]).take(best)
+        return results.append_column("_distance", pa.array(1.0 - similarity[best], pa.float32()))
+
+
+    def _scan_int8(self, query_vector: np.ndarray, limit: int, where: Optional[str]) -> pa.Table:
+        """
+        Score every (matching) row's int8 codes against the query, then fetch the best `limit` rows
+        by row id. Returns them with `_distance` set to 1 - cosine similarity.
+        """
+        scan = self.table.search().select(["embedding"]).with_row_id(True)
+        if where:
+            scan = scan.where(where)
+        codes = scan.to_arrow()
+        similarity = cosine_similarity(query_vector, fixed_size_list_to_numpy(codes["embedding"]))
+        best = np.argsort(-similarity, kind="stable")[:limit]
+        row_ids = pa.array(codes["_rowid"].to_numpy()[best])
+        rows = (
+            self.table.take_row_ids(row_ids.to_pylist())
+            .select(self._result_columns())
+            .with_row_id()
+            .to_arrow()
+        )
+        # take_row_ids returns rows in storage order; put them back in rank order
+        rows = rows.take(pc.index_in(row_ids, rows["_rowid"])).drop_columns(["_rowid"])
+        return rows.append_column("_distance", pa.array(1.0 - similarity[best], pa.float32()))
+
+
+    def _result_columns(self) -> List[str]:
+        return [name for name in self.table.schema.names if name != "keywords" and not name.startswith("embedding")]
+
+
+    def search_by_keyword(
+        self,
+        keyword: str,
+        limit: int = 10,
+        chunk_type: Optional[Union[str, Sequence[str]]] = None,
+        file_path: Optional[str] = None,
+        line_range: Optional[Tuple[int, int]] = None,
+        node_type: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for code chunks by keyword with BM25 over the full-text index on chunk names, code
+        and descriptions. The query is split like the indexed text (camelCase, snake_case, JSX
+        tags), so "navBar" finds NavBarItem. Results carry the BM25 `_score`, best match first.
+        Filters are prefiltered as in search_similar.
+        """
+        tokens = list(dict.fromkeys(tokenize_code(keyword)))
+        if not tokens:
+            return []
+        if self._keyword_index_name() is None:
+            if self.table.count_rows() == 0:
+                return []
+            self.build_keyword_index()
+        search = (
+            self.table.search(" ".join(tokens), query_type="fts", fts_columns="keywords")
+            .select(self._result_columns() + ["_score"])
             .limit(limit)
-            .to_pandas()
         )
-        return results.to_dict("records")
+        where = _build_filter(chunk_type, file_path, line_range, node_type)
+        if where:
+            search = search.where(where, prefilter=True)
+        return search.to_arrow().to_pylist()
+
+
+    def search_hybrid(
+        self,
+        query: str,
+        limit: int = 10,
+        threshold: float = 0.0,
+        semantic_weight: float = 1.0,
+        keyword_weight: float = 1.0,
+        rrf_k: int = RRF_K,
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = DEFAULT_REFINE_FACTOR,
+        **filters,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search with semantic and keyword retrieval at once and fuse the two rankings with weighted
+        reciprocal rank fusion: score = sum(weight / (rrf_k + rank)). Each leg fetches 2 * limit
+        candidates; chunks found by both are merged into one result by id, keeping `similarity`
+        and `_score` from the legs that found them. Results carry `rrf_score`, best first.
+        Both legs run concurrently, so latency is that of the slower one (usually the query
+        embedding). `filters` are the search_similar filters and apply to both legs.
+        """
+        if self._search_executor is None:
+            self._search_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-search")
+        candidates = limit * 2
+        semantic = self._search_executor.submit(
+            self.search_similar,
+            query,
+            limit=candidates,
+            threshold=threshold,
+            nprobes=nprobes,
+            refine_factor=refine_factor,
+            **filters,
+        )
+        keyword = self._search_executor.submit(self.search_by_keyword, query, limit=candidates, **filters)
+
+        fused: Dict[str, Dict[str, Any]] = {}
+        for results, weight in ((semantic.result(), semantic_weight), (keyword.result(), keyword_weight)):
+            for rank, result in enumerate(results, 1):
+                merged = fused.setdefault(result["id"], {**result, "rrf_score": 0.0})
+                merged.update(result)
+                merged["rrf_score"] += weight / (rrf_k + rank)
+        return sorted(fused.values(), key=lambda result: result["rrf_score"], reverse=True)[:limit]
 
 
     def get_stats(self) -> Dict[str, Any]:
         """
-        Get database statistics: total chunks, chunk type distribution, and file distribution.
+        Get database statistics: total chunks, chunk type, node type and file distributions, and
+        how many rows are parts of chunks split for length.
+        Only the few small columns involved are read, and the result is cached per table version;
+        this indexer's own writes update the cached snapshot in place instead of invalidating it.
         """
-        total_chunks = len(self.table)
-        df = self.table.to_pandas()
-        chunk_types = df["chunk_type"].value_counts().to_dict()
-        file_counts = df["file_name"].value_counts().to_dict()
+        with self._stats_lock:
+            if self._stats is None or self._stats_version != self.table.version:
+                self._stats = self._compute_stats()
+                self._stats_version = self.table.version
+            stats = self._stats
+            return {
+                "total_chunks": stats["total_chunks"],
+                "chunk_types": dict(stats["chunk_types"].most_common()),
+                "node_types": dict(stats["node_types"].most_common()),
+                "split_parts": stats["split_parts"],
+                "files": dict(stats["files"].most_common()),
+            }
+
+
+    def _compute_stats(self) -> Dict[str, Any]:
+        data = self.table.search().select(["chunk_type", "node_type", "file_name", "total_parts"]).to_arrow()
+
+        def count(column: str) -> Counter:
+            return Counter(
+                {item["values"]: item["counts"] for item in pc.value_counts(data[column]).to_pylist()}
+            )
+
         return {
-            "total_chunks": total_chunks,
-            "chunk_types": chunk_types,
-            "files": file_counts,
+            "total_chunks": data.num_rows,
+            "chunk_types": count("chunk_type"),
+            "node_types": count("node_type"),
+            "split_parts": pc.sum(pc.greater(data["total_parts"], 1)).as_py() or 0,
+            "files": count("file_name"),
         }
+
+
+    def _update_stats(self, records: List[Dict[str, Any]], version: int) -> None:
+        """
+        Fold appended records into the cached stats, if they describe the table as of `version`
+        (the version the records were appended to); otherwise the next get_stats recomputes.
+        """
+        with self._stats_lock:
+            if self._stats is None or self._stats_version != version:
+                return
+            stats = self._stats
+            stats["total_chunks"] += len(records)
+            for record in records:
+                stats["chunk_types"][record["chunk_type"]] += 1
+                stats["node_types"][record["node_type"]] += 1
+                stats["files"][record["file_name"]] += 1
+                stats["split_parts"] += record["total_parts"] > 1
+            self._stats_version = self.table.version
@@ -0,0 +1,34 @@
+import re
+from typing import List
+
+# Identifiers, including JSX tag and attribute names (`<NavBar onClick=` -> NavBar, onClick)
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Sub-words of an identifier: HTMLParser -> HTML, Parser; navBar2 -> nav, Bar, 2
+SUBWORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Split code or a query into lowercase keyword tokens. Every identifier yields itself plus
+    its camelCase / PascalCase / snake_case parts, so `NavBarItem` matches "navbaritem",
+    "nav bar" and "item" alike.
+    """
+    tokens: List[str] = []
+    for identifier in IDENTIFIER.findall(text):
+        whole = identifier.strip("_").lower()
+        if not whole:
+            continue
+        tokens.append(whole)
+        parts = [part.lower() for part in SUBWORD.findall(identifier)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def keyword_text(chunk_name: str, code: str, description: str) -> str:
+    """
+    Build the whitespace-separated text that the full-text index stores for a chunk.
+    The chunk name is repeated so a hit on the name outweighs a hit in the body.
+    """
+    name_tokens = tokenize_code(chunk_name)
+    return " ".join(name_tokens + name_tokens + tokenize_code(code) + tokenize_code(description))
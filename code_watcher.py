@@ -0,0 +1,125 @@
+import os
+import time
+from collections import deque
+from typing import List
+
+from code_indexer import CodeIndexer
+from index_manifest import IndexManifest, ManifestDiff
+
+
+class CodeWatcher:
+    """
+    CodeWatcher keeps the LanceDB index in sync with a source tree. It polls the tree with
+    IndexManifest (one stat() per file), waits until a burst of changes has been quiet for
+    `debounce` seconds, then re-chunks only the touched files and replaces their rows in batches
+    of `files_per_batch` files (one delete plus one add per batch).
+    The save-to-searchable latency of every applied file is kept in `latencies` (seconds).
+    """
+
+    def __init__(
+        self,
+        src_path: str,
+        chunker,
+        indexer: CodeIndexer,
+        manifest: IndexManifest,
+        poll_interval: float = 0.25,
+        debounce: float = 0.3,
+        files_per_batch: int = 16,
+    ):
+        self.src_path = src_path
+        self.chunker = chunker
+        self.indexer = indexer
+        self.manifest = manifest
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.files_per_batch = files_per_batch
+        self.latencies: deque = deque(maxlen=1000)
+
+    def sync(self) -> ManifestDiff:
+        """
+        Apply every change since the manifest was saved; returns the applied diff.
+        Files changed while nobody was watching have no meaningful save-to-searchable latency, so
+        none is recorded.
+        """
+        diff = self.manifest.scan(self.src_path)
+        if diff:
+            self._apply(diff, record_latency=False)
+        return diff
+
+    def run(self) -> None:
+        """
+        Watch the tree until interrupted.
+        """
+        print(f"Watching {self.src_path} for changes (Ctrl+C to stop)...")
+        try:
+            while True:
+                diff = self.manifest.scan(self.src_path)
+                if not diff:
+                    time.sleep(self.poll_interval)
+                    continue
+                # Debounce: keep collecting until the tree has been quiet for `debounce` seconds
+                added, modified, removed = set(diff.added), set(diff.modified), set(diff.removed)
+                quiet_since = time.monotonic()
+                while time.monotonic() - quiet_since < self.debounce:
+                    time.sleep(min(self.poll_interval, self.debounce))
+                    more = self.manifest.scan(self.src_path)
+                    if more:
+                        quiet_since = time.monotonic()
+                        added.update(more.added)
+                        modified.update(more.modified)
+                        removed.update(more.removed)
+                # Classify by final state: a file deleted and re-created (atomic save) is modified
+                gone = {path for path in added | modified | removed if not os.path.exists(path)}
+                added -= gone
+                modified = (modified | removed) - gone - added
+                self._apply(ManifestDiff(sorted(added), sorted(modified), sorted(gone)))
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+
+    def _apply(self, diff: ManifestDiff, record_latency: bool = True) -> None:
+        stale = diff.stale
+        changed = set(diff.changed)
+        failed = set()
+        for start in range(0, len(stale), self.files_per_batch):
+            batch = stale[start : start + self.files_per_batch]
+            chunks = []
+            for file_path in batch:
+                if file_path in changed and os.path.exists(file_path):
+                    chunks.extend(self.chunker.chunk_file(file_path))
+            try:
+                # Old rows are replaced after the new ones are written, so files stay searchable
+                self.indexer.index_chunks(chunks, replace_files=batch)
+                failed.update(self.indexer.failed_files)
+            except Exception as e:
+                print(f"Error indexing {len(batch)} files: {e}")
+                failed.update(batch)
+                continue
+            if record_latency:
+                self._record_latency([path for path in batch if path in changed and path not in failed])
+        # Failed files stay out of the manifest, so the next scan picks them up again
+        self.manifest.forget(failed)
+        self.manifest.save()
+        print(
+            f"Applied {len(diff.added)} added, {len(diff.modified)} modified, {len(diff.removed)} removed"
+            + (f", {len(failed)} failed" if failed else "")
+            + (f"; {self.latency_summary()}" if record_latency else "")
+        )
+
+    def _record_latency(self, file_paths: List[str]) -> None:
+        now = time.time()
+        for file_path in file_paths:
+            entry = self.manifest.entries.get(file_path)
+            if entry:
+                self.latencies.append(max(0.0, now - entry["mtime"] / 1e9))
+
+    def latency_summary(self) -> str:
+        """
+        Summarize save-to-searchable latency as last/p50/max in milliseconds.
+        """
+        if not self.latencies:
+            return "save-to-searchable latency: n/a"
+        ordered = sorted(self.latencies)
+        return (
+            f"save-to-searchable latency: last={self.latencies[-1] * 1000:.0f}ms "
+            f"p50={ordered[len(ordered) // 2] * 1000:.0f}ms max={ordered[-1] * 1000:.0f}ms"
+        )
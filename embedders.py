@@ -0,0 +1,173 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional
+
+import numpy as np
+
+from code_tokenizer import tokenize_code
+
+# Embedders selectable by name (create_embeddings, `main.py index --embedder NAME`)
+EMBEDDERS = ("openai", "hashing")
+DEFAULT_EMBEDDER = "openai"
+
+# Output sizes of the OpenAI embedding models, so the table schema is known without an API call
+OPENAI_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+class FakeEmbeddings:
+    """
+    FakeEmbeddings is a deterministic, offline stand-in for OpenAIEmbeddings.
+    It derives a unit vector from a hash of the text, so indexing throughput can be
+    benchmarked without network access. An optional per-call latency simulates a remote API.
+    """
+
+    def __init__(self, dimension: int = 1536, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.model = f"fake-{dimension}"
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts with a single (simulated) round trip.
+        """
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single text with a single (simulated) round trip.
+        """
+        return self.embed_documents([text])[0]
+
+
+def _hash_embed(texts: List[str], dimension: int) -> np.ndarray:
+    """
+    Embed texts with the hashing trick: every token and adjacent token pair of tokenize_code
+    is hashed (crc32, stable across processes) to a signed bucket, weighted 1 + log(count),
+    and each row is L2-normalised. Texts without tokens embed to zero vectors.
+    """
+    vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize_code(text)
+        features = Counter(tokens)
+        features.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+        vector = vectors[row]
+        for feature, count in features.items():
+            digest = zlib.crc32(feature.encode("utf-8"))
+            weight = 1.0 + math.log(count)
+            vector[digest % dimension] += -weight if digest & 0x80000000 else weight
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+    return vectors
+
+
+class HashingEmbeddings:
+    """
+    HashingEmbeddings is a local CPU embedder: a hashed bag of code tokens and token pairs
+    (see _hash_embed). It needs no model download or network, is deterministic, and embeds
+    thousands of texts per second per core, at the cost of purely lexical similarity.
+    Batches of at least `min_parallel` texts are split across `workers` processes
+    (default: one per core).
+    """
+
+    def __init__(self, dimension: int = 1536, workers: Optional[int] = None, min_parallel: int = 32):
+        self.dimension = dimension
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel = min_parallel
+        self.model = f"hashing-{dimension}"
+        # Texts sharing a few identifiers already score 0.05-0.3
+        self.similarity_threshold = 0.05
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the parent may hold LanceDB and embedding client threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts, fanned out over the worker processes when it is large enough.
+        """
+        if self.workers <= 1 or len(texts) < self.min_parallel:
+            return _hash_embed(texts, self.dimension).tolist()
+        size = max(self.min_parallel // 2, math.ceil(len(texts) / self.workers))
+        pool = self._pool()
+        futures = [
+            pool.submit(_hash_embed, texts[start : start + size], self.dimension)
+            for start in range(0, len(texts), size)
+        ]
+        return np.concatenate([future.result() for future in futures]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single text in-process.
+        """
+        return _hash_embed([text], self.dimension)[0].tolist()
+
+    def close(self) -> None:
+        """
+        Shut down the worker processes.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def create_embeddings(name: str = DEFAULT_EMBEDDER, openai_api_key: Optional[str] = None, **kwargs) -> Any:
+    """
+    Build an embedder by name: "openai" (OpenAIEmbeddings, remote) or "hashing"
+    (HashingEmbeddings, local CPU). Extra keyword arguments go to the embedder's constructor.
+    """
+    if name == "openai":
+        # Imported here so local embedders never load langchain_openai
+        from langchain_openai import OpenAIEmbeddings
+
+        if openai_api_key:
+            os.environ["OPENAI_API_KEY"] = openai_api_key
+        return OpenAIEmbeddings(**kwargs)
+    if name == "hashing":
+        return HashingEmbeddings(**kwargs)
+    raise ValueError(f"Unknown embedder {name!r}, expected one of: {', '.join(EMBEDDERS)}")
+
+
+def embedding_dimension(embeddings: Any) -> int:
+    """
+    Return the vector size an embedder produces: its `dimension` (or OpenAI `dimensions`)
+    attribute, the known size of its OpenAI model, or else the length of a probe embedding.
+    """
+    dimension = getattr(embeddings, "dimension", None) or getattr(embeddings, "dimensions", None)
+    if dimension:
+        return int(dimension)
+    model = getattr(embeddings, "model", None)
+    if model in OPENAI_DIMENSIONS:
+        return OPENAI_DIMENSIONS[model]
+    return len(embeddings.embed_query("dimension probe"))
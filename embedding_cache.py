@@ -0,0 +1,221 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    EmbeddingCache persists embeddings in a SQLite file, keyed by a hash of the embedding model
+    name and the embedded text. Entries beyond `max_entries` are evicted least recently used first.
+    Each entry records when it was stored, so lookups can skip entries older than a `max_age`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL, created REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "created" not in columns:
+            # Entries of older caches count as stored at the epoch, i.e. older than any max_age
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN created REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """
+        Build the cache key for a text embedded with the given model.
+        """
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up several keys at once; returns only the keys found and refreshes their recency.
+        """
+        return {key: vector for key, (_, vector) in self._lookup(keys).items()}
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Look up a single key.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_entry(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[float, List[float]]]:
+        """
+        Look up a single key stored at most `max_age` seconds ago; returns (stored at, vector) with
+        the time.time() it was stored, or None.
+        """
+        return self._lookup([key], max_age).get(key)
+
+    def _lookup(self, keys: List[str], max_age: Optional[float] = None) -> Dict[str, Tuple[float, List[float]]]:
+        found: Dict[str, Tuple[float, List[float]]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        oldest = time.time() - max_age if max_age is not None else None
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                query = f"SELECT key, vector, created FROM embeddings WHERE key IN ({placeholders})"
+                if oldest is not None:
+                    rows = self._conn.execute(query + " AND created > ?", part + [oldest]).fetchall()
+                else:
+                    rows = self._conn.execute(query, part).fetchall()
+                for key, blob, created in rows:
+                    found[key] = (created, np.frombuffer(blob, dtype=np.float32).tolist())
+                if rows:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _, _ in rows]
+                    )
+            self._conn.commit()
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings and evict the least recently used entries beyond max_entries.
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now, now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used, created) VALUES (?, ?, ?, ?)", rows
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (self._count - self.max_entries,),
+                )
+                self._count = self.max_entries
+            self._conn.commit()
+
+    def reset_counters(self) -> None:
+        """
+        Reset the hit/miss counters.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class QueryEmbeddingCache:
+    """
+    QueryEmbeddingCache is an in-process LRU cache of query embeddings keyed by model and
+    normalized query text (case and whitespace are ignored). Entries expire `ttl` seconds after
+    they were embedded and the least recently used are evicted beyond `max_entries`.
+    An optional EmbeddingCache is used as a second, on-disk level that survives restarts; its
+    entries expire `ttl` seconds after they were stored too.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_entries: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        disk: Optional[EmbeddingCache] = None,
+    ):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.split()).casefold()
+
+    def make_key(self, query: str) -> str:
+        """
+        Build the key for a query; the "query" prefix keeps it apart from document keys on disk.
+        """
+        return EmbeddingCache.make_key(self.model, f"query\0{self.normalize(query)}")
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """
+        Return the cached embedding of a query, or None (counted as a miss).
+        """
+        key = self.make_key(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        entry = self.disk.get_entry(key, max_age=self.ttl) if self.disk is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, vector = entry
+            self.disk_hits += 1
+            # Keep the original embed time, so the entry expires from memory when it would on disk
+            self._store(key, vector, now - max(0.0, time.time() - stored_at))
+        return vector
+
+    def put(self, query: str, vector: List[float]) -> None:
+        """
+        Cache the embedding of a query in memory and, if configured, on disk.
+        """
+        key = self.make_key(query)
+        with self._lock:
+            self._store(key, vector, time.monotonic())
+        if self.disk is not None:
+            self.disk.put_many({key: vector})
+
+    def _store(self, key: str, vector: List[float], now: float) -> None:
+        self._entries[key] = (now, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of lookups answered from memory or disk.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self._entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
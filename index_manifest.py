@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+
+class ManifestDiff:
+    """
+    Files added, modified and removed since the manifest was last saved.
+    """
+
+    def __init__(self, added: List[str], modified: List[str], removed: List[str]):
+        self.added = added
+        self.modified = modified
+        self.removed = removed
+
+    @property
+    def changed(self) -> List[str]:
+        """Files that must be (re-)chunked: added + modified"""
+        return self.added + self.modified
+
+    @property
+    def stale(self) -> List[str]:
+        """Files whose existing rows must be deleted: added + modified + removed"""
+        return self.added + self.modified + self.removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    def __repr__(self) -> str:
+        return f"ManifestDiff(added={len(self.added)}, modified={len(self.modified)}, removed={len(self.removed)})"
+
+
+class IndexManifest:
+    """
+    IndexManifest records file path -> (mtime, size, content hash) for every indexed file, so an
+    incremental run only re-chunks files that changed. Files are only hashed when their mtime or
+    size differ from the manifest, keeping a scan of an unchanged tree to one stat() per file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def list_files(src_path: str) -> List[str]:
+        """
+        List TSX/TS files the same way the chunkers' chunk_directory does.
+        """
+        directory = Path(src_path)
+        return [str(p) for p in list(directory.rglob("*.tsx")) + list(directory.rglob("*.ts"))]
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def scan(self, src_path: str) -> ManifestDiff:
+        """
+        Compare the tree under src_path with the manifest and update the in-memory entries.
+        Call save() once the changes have been indexed.
+        """
+        added, modified = [], []
+        seen = set()
+        for file_path in self.list_files(src_path):
+            seen.add(file_path)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entry = self.entries.get(file_path)
+            if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            content_hash = self.hash_file(file_path)
+            if entry is None:
+                added.append(file_path)
+            elif entry["hash"] != content_hash:
+                modified.append(file_path)
+            self.entries[file_path] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": content_hash}
+
+        prefix = str(Path(src_path))
+        removed = [
+            file_path
+            for file_path in self.entries
+            if file_path not in seen and (prefix == "." or Path(file_path).is_relative_to(prefix))
+        ]
+        for file_path in removed:
+            del self.entries[file_path]
+        return ManifestDiff(added, modified, removed)
+
+    def forget(self, file_paths: Iterable[str]) -> None:
+        """
+        Drop entries, so the next scan reports those files as added (e.g. after they failed to index).
+        """
+        for file_path in file_paths:
+            self.entries.pop(file_path, None)
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
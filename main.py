@@ -5,11 +5,20 @@ Main script for code indexing and semantic search using tree-sitter and LanceDB
 
 import os
 import sys
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 from simple_tree_sitter_chunker import SimpleTreeSitterChunker as TreeSitterChunker
-from code_indexer import CodeIndexer
+from index_manifest import IndexManifest
+from parallel_chunking import chunk_files
+from search_server import DEFAULT_HOST, DEFAULT_PORT, search_remote, server_available
 import json
 
+# code_indexer pulls in lancedb and langchain (seconds of import time), so it is only imported
+# by commands that need a local indexer; `search` against a running server never loads it.
+if TYPE_CHECKING:
+    from code_indexer import CodeIndexer
+
 
 def setup_environment():
     """Setup environment and check dependencies"""
@@ -17,13 +26,81 @@ def setup_environment():
     return True
 
 
-def index_codebase(src_path: str = "src", openai_api_key: str = None):
-    """Index the entire codebase"""
+def pop_option(args: list, name: str, default=None):
+    """Remove `name value` from args and return the value (or default if absent)"""
+    if name not in args:
+        return default
+    i = args.index(name)
+    value = args[i + 1] if i + 1 < len(args) else default
+    del args[i : i + 2]
+    return value
+
+
+def pop_flag(args: list, name: str) -> bool:
+    """Remove a boolean flag from args and return whether it was present"""
+    if name not in args:
+        return False
+    args.remove(name)
+    return True
+
+
+def create_indexer(**kwargs) -> "CodeIndexer":
+    """Import code_indexer on first use and build a CodeIndexer"""
+    from code_indexer import CodeIndexer
+
+    return CodeIndexer(**kwargs)
+
+
+def index_codebase(
+    src_path: str = "src",
+    openai_api_key: str = None,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    requests_per_minute: int = None,
+    tokens_per_minute: int = None,
+    use_cache: bool = True,
+    incremental: bool = False,
+    workers: int = 1,
+    stream: bool = False,
+    embedder: str = None,
+    vector_format: str = None,
+    short_dimension: int = None,
+):
+    """Index the entire codebase, or only files changed since the last run if incremental"""
     print(f"Starting codebase indexing from {src_path}...")
 
     # Initialize chunker and indexer
     chunker = TreeSitterChunker()
-    indexer = CodeIndexer(openai_api_key=openai_api_key)
+    indexer = create_indexer(
+        openai_api_key=openai_api_key,
+        batch_size=batch_size,
+        max_in_flight=concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        use_cache=use_cache,
+        embedder=embedder,
+        vector_format=vector_format,
+        short_dimension=short_dimension,
+    )
+    manifest = IndexManifest(f"{indexer.db_path.rstrip('/')}_manifest.json")
+
+    if incremental:
+        index_changed_files(src_path, chunker, indexer, manifest, workers=workers)
+        return
+
+    if stream:
+        # Chunks flow straight from the chunker into batched embedding and writes
+        print("Streaming chunks into LanceDB...")
+        indexed_count = indexer.index_chunks(
+            chunker.iter_chunks(src_path, workers=workers),
+            replace_files=IndexManifest.list_files(src_path),
+        )
+        print(f"Indexing completed! Indexed {indexed_count} chunks")
+        indexer.delete_files(manifest.scan(src_path).removed)
+        manifest.forget(indexer.failed_files)
+        manifest.save()
+        print_stats(indexer)
+        return
 
     # Chunk all files
     print("Chunking code files...")
@@ -40,7 +117,7 @@ def index_codebase(src_path: str = "src", openai_api_key: str = None):
     if len(all_files) > 5:
         print(f"  ... and {len(all_files) - 5} more files")
 
-    chunks = chunker.chunk_directory(src_path)
+    chunks = chunker.chunk_directory(src_path, workers=workers)
     print(f"Chunks found: {len(chunks)}")
     if chunks:
         print("First chunk details:")
@@ -58,27 +135,151 @@ def index_codebase(src_path: str = "src", openai_api_key: str = None):
 
     # Index chunks
     print("Indexing chunks into LanceDB...")
-    indexed_count = indexer.index_chunks(chunks)
+    indexed_count = indexer.index_chunks(chunks, replace_files=IndexManifest.list_files(src_path))
 
     print(f"Indexing completed! Indexed {indexed_count} chunks")
 
-    # Show statistics
+    # Record file state so later runs can be incremental, dropping rows of files deleted since the last run
+    indexer.delete_files(manifest.scan(src_path).removed)
+    manifest.forget(indexer.failed_files)
+    manifest.save()
+
+    print_stats(indexer)
+
+
+def index_changed_files(
+    src_path: str, chunker, indexer: "CodeIndexer", manifest: IndexManifest, workers: int = 1
+):
+    """Re-index only files added, modified or removed since the manifest was saved"""
+    diff = manifest.scan(src_path)
+    print(
+        f"Incremental scan: {len(diff.added)} added, {len(diff.modified)} modified, "
+        f"{len(diff.removed)} removed"
+    )
+    if not diff:
+        print("Index is up to date.")
+        return
+
+    # Re-chunk the files that still exist; rows of every touched file that this run does not
+    # write again are deleted after the new rows are in, so the files stay searchable meanwhile
+    chunks = []
+    for file_path, file_chunks in chunk_files(chunker, diff.changed, workers):
+        print(f"Chunking {file_path}...")
+        chunks.extend(file_chunks)
+
+    indexed_count = indexer.index_chunks(chunks, replace_files=diff.stale)
+    # Files that failed to write stay out of the manifest, so the next run retries them
+    manifest.forget(indexer.failed_files)
+    manifest.save()
+    print(f"Incremental indexing completed! Indexed {indexed_count} chunks")
+
+    print_stats(indexer)
+
+
+def watch_codebase(
+    src_path: str = "src", openai_api_key: str = None, debounce: float = 0.3, embedder: str = None
+):
+    """Keep the index in sync with src_path as files change"""
+    from code_watcher import CodeWatcher
+
+    chunker = TreeSitterChunker()
+    indexer = create_indexer(openai_api_key=openai_api_key, embedder=embedder)
+    manifest = IndexManifest(f"{indexer.db_path.rstrip('/')}_manifest.json")
+    watcher = CodeWatcher(src_path, chunker, indexer, manifest, debounce=debounce)
+
+    # Catch up with changes made while nothing was watching
+    print("Syncing index with working tree...")
+    watcher.sync()
+    watcher.run()
+
+
+def build_index(partitions: int = None, sub_vectors: int = None):
+    """Build the ANN index on the embedding column of an existing index"""
+    indexer = create_indexer()
+    indexer.build_vector_index(num_partitions=partitions, num_sub_vectors=sub_vectors)
+    print_stats(indexer)
+
+
+def maintain(retention_days: float = 7.0, probe_query: str = "component", probes: int = 10):
+    """Compact the table, prune old versions and refresh indexes, reporting before/after numbers"""
+    indexer = create_indexer()
+
+    def query_latency_ms() -> float:
+        # Median of repeated probe searches; the first call warms the query embedding cache
+        indexer.search_similar(probe_query)
+        samples = []
+        for _ in range(probes):
+            start = time.perf_counter()
+            indexer.search_similar(probe_query)
+            samples.append((time.perf_counter() - start) * 1000)
+        return sorted(samples)[len(samples) // 2]
+
+    latency_before = query_latency_ms()
+    report = indexer.optimize(retention_days=retention_days)
+    latency_after = query_latency_ms()
+    print(f"Optimized in {report['elapsed']:.1f}s")
+    print(f"{'':<16}{'before':>12}{'after':>12}")
+    for key, label in (
+        ("fragments", "Fragments"),
+        ("small_fragments", "Small fragments"),
+        ("versions", "Versions"),
+        ("bytes", "Bytes on disk"),
+    ):
+        print(f"{label:<16}{report['before'][key]:>12}{report['after'][key]:>12}")
+    print(f"{'Query p50 (ms)':<16}{latency_before:>12.1f}{latency_after:>12.1f}")
+
+
+def print_stats(indexer: "CodeIndexer"):
+    """Print database statistics"""
     stats = indexer.get_stats()
     print("\nDatabase Statistics:")
     print(f"Total chunks: {stats['total_chunks']}")
     print(f"Chunk types: {stats['chunk_types']}")
+    print(f"Node types: {stats['node_types']}")
+    print(f"Split chunk parts: {stats['split_parts']}")
     print(f"Files indexed: {len(stats['files'])}")
+    short = f", first search stage on {indexer.short_dimension}" if indexer.short_dimension else ""
+    print(f"Vector format: {indexer.vector_format} ({indexer.dimension} dimensions{short})")
+    index_stats = indexer.vector_index_stats()
+    if index_stats:
+        print(
+            f"Vector index: {index_stats['index_type']} ({index_stats['distance_type']}), "
+            f"{index_stats['indexed_rows']} indexed, {index_stats['unindexed_rows']} unindexed rows"
+        )
+
+
+def search_code(
+    query: str,
+    limit: int = 10,
+    threshold: float = None,
+    hybrid: bool = False,
+    indexer: "CodeIndexer" = None,
+    use_server: bool = True,
+    port: int = DEFAULT_PORT,
+    **options,
+):
+    """Search for code using semantic (or hybrid) search, through the search server when one is running"""
+    print(f"Searching for: '{query}'")
 
+    # Hybrid search ranks by fused rank, so the similarity threshold only applies to semantic search
+    options["limit"] = limit
+    if not hybrid and threshold is not None:
+        options["threshold"] = threshold
 
-def search_code(query: str, limit: int = 10, threshold: float = 0.7):
-    """Search for code using semantic search"""
-    print(f"Searching for: '{query}'")
+    results = None
+    if indexer is None and use_server:
+        try:
+            results = search_remote(query, port=port, hybrid=hybrid, **options)
+        except OSError:
+            pass  # No server listening: search locally
 
-    # Initialize indexer
-    indexer = CodeIndexer()
+    if results is None:
+        # Initialize indexer
+        indexer = indexer or create_indexer()
 
-    # Perform semantic search
-    results = indexer.search_similar(query, limit=limit, threshold=threshold)
+        # Perform semantic search
+        search = indexer.search_hybrid if hybrid else indexer.search_similar
+        results = search(query, **options)
 
     if not results:
         print("No results found.")
@@ -91,7 +292,10 @@ def search_code(query: str, limit: int = 10, threshold: float = 0.7):
         print(f"\n{i}. {result['chunk_name']} ({result['chunk_type']})")
         print(f"   File: {result['file_name']}")
         print(f"   Lines: {result['start_line']}-{result['end_line']}")
-        print(f"   Similarity: {result['similarity']:.3f}")
+        if "rrf_score" in result:
+            print(f"   Hybrid score: {result['rrf_score']:.4f}")
+        if "similarity" in result:
+            print(f"   Similarity: {result['similarity']:.3f}")
         print(f"   Code preview:")
 
         # Show first few lines of code
@@ -105,13 +309,18 @@ def search_code(query: str, limit: int = 10, threshold: float = 0.7):
         print("-" * 40)
 
 
-def interactive_search():
+def interactive_search(port: int = DEFAULT_PORT):
     """Interactive search mode"""
     print("Interactive Code Search Mode")
     print("Type 'quit' to exit")
     print("-" * 40)
 
-    indexer = CodeIndexer()
+    # One indexer for the whole session, unless a search server already holds one
+    indexer = None
+    if server_available(port=port):
+        print(f"Using search server on port {port}")
+    else:
+        indexer = create_indexer()
 
     while True:
         try:
@@ -123,7 +332,7 @@ def interactive_search():
             if not query:
                 continue
 
-            search_code(query)
+            search_code(query, indexer=indexer, port=port)
 
         except KeyboardInterrupt:
             print("\nExiting...")
@@ -131,40 +340,151 @@ def interactive_search():
         except Exception as e:
             print(f"Error: {e}")
 
+    if indexer is not None and indexer.query_cache is not None:
+        stats = indexer.query_cache.stats()
+        print(
+            f"Query embedding cache: {stats['hits']} hits, {stats['disk_hits']} disk hits, "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)"
+        )
+
+
+def serve(openai_api_key: str = None, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, refresh: float = 1.0):
+    """Run the search server until interrupted"""
+    from search_server import SearchServer
+
+    indexer = create_indexer(openai_api_key=openai_api_key, read_consistency_interval=refresh)
+    server = SearchServer(indexer, host, port)
+    print(f"Search server listening on http://{host}:{port} ({indexer.table.count_rows()} chunks)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping search server...")
+    finally:
+        server.server_close()
+
 
 def main():
     """Main function"""
     if len(sys.argv) < 2:
         print("Usage:")
-        print("  python main.py index [src_path] [openai_api_key]")
-        print("  python main.py search <query>")
-        print("  python main.py interactive")
+        print(
+            "  python main.py index [src_path] [openai_api_key] [--batch-size N]"
+            " [--concurrency N] [--rpm N] [--tpm N] [--no-cache] [--incremental] [--workers N] [--stream]"
+            " [--embedder openai|hashing] [--vector-format float32|float16|int8|binary] [--short-dimension N]"
+        )
+        print("  python main.py index build [--partitions N] [--sub-vectors N]")
+        print("  python main.py maintain [--retention-days DAYS]")
+        print("  python main.py watch [src_path] [openai_api_key] [--debounce SECONDS] [--embedder NAME]")
+        print("  python main.py serve [openai_api_key] [--host HOST] [--port N] [--refresh SECONDS]")
+        print(
+            "  python main.py search <query> [--hybrid] [--type T[,T...]] [--path PREFIX_OR_GLOB]"
+            " [--lines FIRST-LAST] [--node-type T] [--nprobes N] [--refine-factor N] [--port N] [--local]"
+        )
+        print("  python main.py interactive [--port N]")
         return
 
     command = sys.argv[1]
 
-    if command == "index":
-        src_path = sys.argv[2] if len(sys.argv) > 2 else "src"
-        openai_api_key = sys.argv[3] if len(sys.argv) > 3 else None
+    if command == "index" and sys.argv[2:3] == ["build"]:
+        args = sys.argv[3:]
+        partitions = pop_option(args, "--partitions")
+        sub_vectors = pop_option(args, "--sub-vectors")
+        build_index(int(partitions) if partitions else None, int(sub_vectors) if sub_vectors else None)
+
+    elif command == "index":
+        args = sys.argv[2:]
+        batch_size = int(pop_option(args, "--batch-size", 64))
+        concurrency = int(pop_option(args, "--concurrency", 4))
+        rpm = pop_option(args, "--rpm")
+        tpm = pop_option(args, "--tpm")
+        use_cache = not pop_flag(args, "--no-cache")
+        incremental = pop_flag(args, "--incremental")
+        workers = int(pop_option(args, "--workers", 1))
+        stream = pop_flag(args, "--stream")
+        embedder = pop_option(args, "--embedder")
+        vector_format = pop_option(args, "--vector-format")
+        short_dimension = pop_option(args, "--short-dimension")
+        src_path = args[0] if len(args) > 0 else "src"
+        openai_api_key = args[1] if len(args) > 1 else None
 
         # if not setup_environment():
         #     return
 
-        index_codebase(src_path, openai_api_key)
+        index_codebase(
+            src_path,
+            openai_api_key,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            requests_per_minute=int(rpm) if rpm else None,
+            tokens_per_minute=int(tpm) if tpm else None,
+            use_cache=use_cache,
+            incremental=incremental,
+            workers=workers,
+            stream=stream,
+            embedder=embedder,
+            vector_format=vector_format,
+            short_dimension=int(short_dimension) if short_dimension else None,
+        )
+
+    elif command == "maintain":
+        args = sys.argv[2:]
+        maintain(retention_days=float(pop_option(args, "--retention-days", 7.0)))
+
+    elif command == "watch":
+        args = sys.argv[2:]
+        debounce = float(pop_option(args, "--debounce", 0.3))
+        embedder = pop_option(args, "--embedder")
+        src_path = args[0] if len(args) > 0 else "src"
+        openai_api_key = args[1] if len(args) > 1 else None
+        watch_codebase(src_path, openai_api_key, debounce=debounce, embedder=embedder)
+
+    elif command == "serve":
+        args = sys.argv[2:]
+        host = pop_option(args, "--host", DEFAULT_HOST)
+        port = int(pop_option(args, "--port", DEFAULT_PORT))
+        refresh = float(pop_option(args, "--refresh", 1.0))
+        openai_api_key = args[0] if len(args) > 0 else None
+        serve(openai_api_key, host=host, port=port, refresh=refresh)
 
     elif command == "search":
-        if len(sys.argv) < 3:
+        args = sys.argv[2:]
+        options = {}
+        nprobes = pop_option(args, "--nprobes")
+        if nprobes:
+            options["nprobes"] = int(nprobes)
+        refine_factor = pop_option(args, "--refine-factor")
+        if refine_factor is not None:
+            options["refine_factor"] = int(refine_factor)
+        chunk_type = pop_option(args, "--type")
+        if chunk_type:
+            options["chunk_type"] = chunk_type.split(",")
+        file_path = pop_option(args, "--path")
+        if file_path:
+            options["file_path"] = file_path
+        lines = pop_option(args, "--lines")
+        if lines:
+            first, _, last = lines.partition("-")
+            options["line_range"] = (int(first), int(last or first))
+        node_type = pop_option(args, "--node-type")
+        if node_type:
+            options["node_type"] = node_type
+        port = int(pop_option(args, "--port", DEFAULT_PORT))
+        use_server = not pop_flag(args, "--local")
+        hybrid = pop_flag(args, "--hybrid")
+        if not args:
             print("Please provide a search query")
             return
 
-        query = sys.argv[2]
-        search_code(query)
+        query = args[0]
+        search_code(query, hybrid=hybrid, use_server=use_server, port=port, **options)
 
     elif command == "interactive":
+        args = sys.argv[2:]
+        port = int(pop_option(args, "--port", DEFAULT_PORT))
         if not setup_environment():
             return
 
-        interactive_search()
+        interactive_search(port=port)
 
     else:
         print(f"Unknown command: {command}")
@@ -0,0 +1,51 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_worker_chunker = None
+
+
+def _init_worker(chunker_class) -> None:
+    """Build one chunker per worker process (tree-sitter parsers cannot be pickled)"""
+    global _worker_chunker
+    _worker_chunker = chunker_class()
+
+
+def _chunk_batch(file_paths: List[str]) -> List[List[Dict[str, Any]]]:
+    return [_worker_chunker.chunk_file(file_path) for file_path in file_paths]
+
+
+def chunk_files(
+    chunker, file_paths: List[str], workers: int = 1, chunksize: Optional[int] = None
+) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Yield (file_path, chunks) for every file, in the order of file_paths.
+    With workers > 1 the files are fanned out over a process pool in batches of `chunksize`
+    files (default: enough for ~4 batches per worker) and results stream back as they complete.
+    At most two batches per worker are outstanding, so a slow consumer bounds memory.
+    """
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield file_path, chunker.chunk_file(file_path)
+        return
+
+    if chunksize is None:
+        chunksize = max(1, min(64, len(file_paths) // (workers * 4)))
+    # Spawned, not forked: the parent may hold LanceDB and embedding client threads
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(type(chunker),),
+    ) as executor:
+        batches = (file_paths[i : i + chunksize] for i in range(0, len(file_paths), chunksize))
+        in_flight: deque = deque()
+        for batch in batches:
+            in_flight.append((batch, executor.submit(_chunk_batch, batch)))
+            if len(in_flight) >= workers * 2:
+                done_batch, future = in_flight.popleft()
+                yield from zip(done_batch, future.result())
+        while in_flight:
+            done_batch, future = in_flight.popleft()
+            yield from zip(done_batch, future.result())
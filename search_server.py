@@ -0,0 +1,161 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# This module is imported by the thin client in main.py, so it must stay stdlib-only:
+# importing lancedb and langchain is exactly the cold start the server exists to avoid.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# search_similar keyword arguments a client may set
+SEARCH_OPTIONS = (
+    "limit",
+    "threshold",
+    "nprobes",
+    "refine_factor",
+    "chunk_type",
+    "file_path",
+    "line_range",
+    "node_type",
+)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_str_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+# How each search option is validated, and the message returned when it is not
+OPTION_CHECKS = {
+    "limit": (lambda value: _is_int(value) and value > 0, "a positive integer"),
+    "threshold": (lambda value: _is_int(value) or isinstance(value, float), "a number"),
+    "nprobes": (lambda value: _is_int(value) and value > 0, "a positive integer"),
+    "refine_factor": (lambda value: _is_int(value) and value >= 0, "a non-negative integer"),
+    "chunk_type": (lambda value: isinstance(value, str) or _is_str_list(value), "a string or a list of strings"),
+    "file_path": (lambda value: isinstance(value, str), "a string"),
+    "line_range": (
+        lambda value: isinstance(value, list) and len(value) == 2 and all(_is_int(item) for item in value),
+        "a list of two integers",
+    ),
+    "node_type": (lambda value: isinstance(value, str), "a string"),
+}
+
+
+def parse_search_options(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pick the search_similar options out of a request body, checking their JSON types.
+    Raises ValueError naming the first invalid option.
+    """
+    options = {}
+    for name in SEARCH_OPTIONS:
+        value = request.get(name)
+        if value is None:
+            continue
+        check, expected = OPTION_CHECKS[name]
+        if not check(value):
+            raise ValueError(f"{name} must be {expected}, got {json.dumps(value)}")
+        options[name] = tuple(value) if name == "line_range" else value
+    return options
+
+
+class SearchServer(ThreadingHTTPServer):
+    """
+    SearchServer is a long-lived localhost HTTP server around one CodeIndexer, so the open
+    table, the embedding client and every cache stay warm between queries.
+
+    POST /search  {"query": ..., "limit": ..., ...}  ->  {"results": [...], "elapsed_ms": ...}
+                  ("hybrid": true runs search_hybrid instead of search_similar)
+    GET  /health                                     ->  {"status": "ok", "rows": ..., "query_cache": ...}
+    """
+
+    daemon_threads = True
+
+    def __init__(self, indexer, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        super().__init__((host, port), SearchRequestHandler)
+        self.indexer = indexer
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    server: SearchServer
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        indexer = self.server.indexer
+        query_cache = indexer.query_cache.stats() if indexer.query_cache is not None else None
+        self._send_json(200, {"status": "ok", "rows": indexer.table.count_rows(), "query_cache": query_cache})
+
+    def do_POST(self):
+        if self.path != "/search":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            query = request["query"]
+            if not isinstance(query, str):
+                raise ValueError(f"query must be a string, got {json.dumps(query)}")
+            options = parse_search_options(request)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+        indexer = self.server.indexer
+        search = indexer.search_hybrid if request.get("hybrid") else indexer.search_similar
+        start = time.perf_counter()
+        try:
+            results = search(query, **options)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._send_json(200, {"results": results, "elapsed_ms": elapsed_ms})
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def search_remote(
+    query: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 30.0, **options
+) -> List[Dict[str, Any]]:
+    """
+    Run a search on a running SearchServer.
+    Raises OSError (URLError) when no server is listening and RuntimeError when the server
+    fails the query.
+    """
+    payload = {"query": query, **{name: value for name, value in options.items() if value is not None}}
+    request = urllib.request.Request(
+        f"http://{host}:{port}/search",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["results"]
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Search server error {e.code}: {e.read().decode('utf-8', 'replace')}")
+
+
+def server_available(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 1.0) -> bool:
+    """
+    Whether a SearchServer answers on host:port.
+    """
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
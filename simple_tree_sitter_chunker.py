@@ -1,8 +1,166 @@
 import os
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import re
 
+from parallel_chunking import chunk_files
+from source_file import SourceFile
+
+# Function declaration: function name() { ... }
+FUNCTION_DECLARATION = re.compile(r"function\s+(\w+)\s*\([^)]*\)\s*\{")
+# Arrow function: const name = () => { ... }
+ARROW_BLOCK = re.compile(r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\{")
+# Arrow function: const name = () => ( ... )
+ARROW_EXPRESSION = re.compile(r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\(")
+# export default function Component() { ... }
+EXPORT_DEFAULT_FUNCTION = re.compile(r"export\s+default\s+function\s+(\w+)\s*\([^)]*\)\s*\{")
+# Method definition: name() { ... }
+METHOD_DEFINITION = re.compile(r"(\w+)\s*\([^)]*\)\s*\{")
+# Every pattern above ends in ") {" or ") =>", so lines without it are skipped outright
+DEFINITION_CANDIDATE = re.compile(r"\)\s*(?:\{|=>)")
+
+IMPORT_PATTERN = re.compile(r"^import\s+.*$")
+
+# Lexer tokens for BlockIndex
+CODE_TOKEN = re.compile(r"[{}'\"`]|//|/\*")
+TEMPLATE_TOKEN = re.compile(r"\\.|`|\$\{")
+STRING_END = {
+    "'": re.compile(r"(?:[^'\\]|\\.)*'"),
+    '"': re.compile(r'(?:[^"\\]|\\.)*"'),
+}
+TEMPLATE_EXPRESSION = -1
+
+
+def _group(match) -> Optional[str]:
+    return match.group(1) if match else None
+
+
+def _classify_line(line: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return (function_name, component_name) for a line, or None for each kind that does not match.
+    Functions try declaration, arrow block, arrow expression, then method; components try arrow
+    block, arrow expression, export default function, then declaration. The first pattern that
+    matches anywhere in the line names the chunk; each pattern runs at most once per line.
+    """
+    if not DEFINITION_CANDIDATE.search(line):
+        return None, None
+
+    declaration = _group(FUNCTION_DECLARATION.search(line))
+    arrow = None
+    if "=>" in line:
+        arrow = _group(ARROW_BLOCK.search(line)) or _group(ARROW_EXPRESSION.search(line))
+
+    function_name = declaration or arrow
+    if function_name is None:
+        function_name = _group(METHOD_DEFINITION.search(line))
+
+    component_name = arrow
+    if component_name is None and "export" in line:
+        component_name = _group(EXPORT_DEFAULT_FUNCTION.search(line))
+    if component_name is None:
+        component_name = declaration
+
+    return function_name, component_name
+
+
+class BlockIndex:
+    """
+    Brace-matching table for a file, built by a single lexer pass that skips the contents of
+    strings, template literals (but not their ${...} expressions) and comments.
+    A quote with no closing quote on its line (e.g. an apostrophe in JSX text) does not start a
+    string, so it hides no braces.
+
+    end(start_line) answers in O(1): starting at the first line at or after start_line that
+    opens a brace, it returns the line closing the first brace on that line still open at the
+    end of the line, that line itself if all its braces close on it, or the last line when no
+    brace opens or the block never closes.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.last_line = len(lines) - 1
+        opens_by_line = self._lex(lines)
+
+        self._block_end: List[Optional[int]] = [None] * len(lines)
+        self._next_open: List[Optional[int]] = [None] * len(lines)
+        next_open = None
+        for i in range(len(lines) - 1, -1, -1):
+            opens = opens_by_line[i]
+            if opens:
+                next_open = i
+                end = i
+                for close_line in opens:
+                    if close_line != i:
+                        end = close_line if close_line >= 0 else self.last_line
+                        break
+                self._block_end[i] = end
+            self._next_open[i] = next_open
+
+    def _lex(self, lines: List[str]) -> List[List[int]]:
+        """Return, per line, the closing line of each brace it opens (-1 if never closed)"""
+        close_line: List[int] = []
+        opens_by_token_line: List[List[int]] = []
+        stack: List[int] = []
+        modes = ["code"]
+
+        for i, line in enumerate(lines):
+            line_opens: List[int] = []
+            opens_by_token_line.append(line_opens)
+            pos = 0
+            while True:
+                mode = modes[-1]
+                if mode == "comment":
+                    end = line.find("*/", pos)
+                    if end < 0:
+                        break
+                    modes.pop()
+                    pos = end + 2
+                elif mode == "template":
+                    match = TEMPLATE_TOKEN.search(line, pos)
+                    if not match:
+                        break
+                    pos = match.end()
+                    token = match.group()
+                    if token == "`":
+                        modes.pop()
+                    elif token == "${":
+                        stack.append(TEMPLATE_EXPRESSION)
+                        modes.append("code")
+                else:
+                    match = CODE_TOKEN.search(line, pos)
+                    if not match:
+                        break
+                    pos = match.end()
+                    token = match.group()
+                    if token == "{":
+                        line_opens.append(len(close_line))
+                        stack.append(len(close_line))
+                        close_line.append(-1)
+                    elif token == "}":
+                        if stack:
+                            opened = stack.pop()
+                            if opened == TEMPLATE_EXPRESSION:
+                                modes.pop()
+                            else:
+                                close_line[opened] = i
+                    elif token == "//":
+                        break
+                    elif token == "/*":
+                        modes.append("comment")
+                    elif token == "`":
+                        modes.append("template")
+                    else:
+                        string_end = STRING_END[token].match(line, pos)
+                        if string_end:
+                            pos = string_end.end()
+
+        return [[close_line[token] for token in line_opens] for line_opens in opens_by_token_line]
+
+    def end(self, start_line: int) -> int:
+        open_line = self._next_open[start_line] if start_line <= self.last_line else None
+        if open_line is None:
+            return self.last_line
+        return self._block_end[open_line]
+
 
 class SimpleTreeSitterChunker:
     def __init__(self):
@@ -12,10 +170,8 @@ class SimpleTreeSitterChunker:
     def parse_file(self, file_path: str) -> Optional[dict]:
         """Parse a TSX/TS file using regex patterns"""
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-
-            return {"content": content, "lines": content.split("\n")}
+            source = SourceFile.read(file_path)
+            return {"content": source.text, "lines": source.lines, "source": source}
         except Exception as e:
             print(f"Error parsing {file_path}: {e}")
             return None
@@ -24,91 +180,63 @@ class SimpleTreeSitterChunker:
         self, parsed_file: dict, source_code: str
     ) -> List[Dict[str, Any]]:
         """Extract function declarations using regex"""
-        functions = []
-        lines = parsed_file["lines"]
-
-        # Patterns for different function types
-        patterns = [
-            # Function declaration: function name() { ... }
-            r"function\s+(\w+)\s*\([^)]*\)\s*\{",
-            # Arrow function: const name = () => { ... }
-            r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\{",
-            # Arrow function: const name = () => ( ... )
-            r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\(",
-            # Method definition: name() { ... }
-            r"(\w+)\s*\([^)]*\)\s*\{",
-        ]
-
-        for i, line in enumerate(lines):
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    function_name = match.group(1)
-
-                    # Find function body (simplified)
-                    start_line = i
-                    end_line = self._find_function_end(lines, i)
-
-                    function_code = "\n".join(lines[start_line : end_line + 1])
-
-                    functions.append(
-                        {
-                            "type": "function",
-                            "name": function_name,
-                            "code": function_code,
-                            "start_line": start_line,
-                            "end_line": end_line,
-                            "node_type": "function_declaration",
-                        }
-                    )
-                    break
-
-        return functions
+        return self.extract_definitions(parsed_file, source_code)[0]
 
     def extract_components(
         self, parsed_file: dict, source_code: str
     ) -> List[Dict[str, Any]]:
         """Extract React components using regex"""
+        return self.extract_definitions(parsed_file, source_code)[1]
+
+    def extract_definitions(
+        self, parsed_file: dict, source_code: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Extract functions and React components in a single pass over the lines"""
+        functions = []
         components = []
         lines = parsed_file["lines"]
-
-        # Patterns for React components
-        patterns = [
-            # const Component = () => { ... }
-            r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\{",
-            # const Component = () => ( ... )
-            r"const\s+(\w+)\s*=\s*\([^)]*\)\s*=>\s*\(",
-            # export default function Component() { ... }
-            r"export\s+default\s+function\s+(\w+)\s*\([^)]*\)\s*\{",
-            # function Component() { ... }
-            r"function\s+(\w+)\s*\([^)]*\)\s*\{",
-        ]
+        source = parsed_file.get("source")
+        block_index = None
 
         for i, line in enumerate(lines):
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    component_name = match.group(1)
-
-                    # Find component body
-                    start_line = i
-                    end_line = self._find_function_end(lines, i)
-
-                    component_code = "\n".join(lines[start_line : end_line + 1])
-
-                    components.append(
-                        {
-                            "type": "component",
-                            "name": component_name,
-                            "code": component_code,
-                            "start_line": start_line,
-                            "end_line": end_line,
-                            "node_type": "component",
-                        }
-                    )
-                    break
-
-        return components
+            function_name, component_name = _classify_line(line)
+            if function_name is None and component_name is None:
+                continue
+
+            # Find body end once for both chunk kinds
+            if block_index is None:
+                block_index = BlockIndex(lines)
+            start_line = i
+            end_line = block_index.end(i)
+            if source is not None:
+                code = source.line_range(start_line, end_line)
+            else:
+                code = "\n".join(lines[start_line : end_line + 1])
+
+            if function_name is not None:
+                functions.append(
+                    {
+                        "type": "function",
+                        "name": function_name,
+                        "code": code,
+                        "start_line": start_line,
+                        "end_line": end_line,
+                        "node_type": "function_declaration",
+                    }
+                )
+            if component_name is not None:
+                components.append(
+                    {
+                        "type": "component",
+                        "name": component_name,
+                        "code": code,
+                        "start_line": start_line,
+                        "end_line": end_line,
+                        "node_type": "component",
+                    }
+                )
+
+        return functions, components
 
     def extract_imports(
         self, parsed_file: dict, source_code: str
@@ -117,14 +245,13 @@ class SimpleTreeSitterChunker:
         imports = []
         lines = parsed_file["lines"]
 
-        import_pattern = r"^import\s+.*$"
-
         for i, line in enumerate(lines):
-            if re.match(import_pattern, line.strip()):
+            stripped = line.strip()
+            if IMPORT_PATTERN.match(stripped):
                 imports.append(
                     {
                         "type": "import",
-                        "code": line.strip(),
+                        "code": stripped,
                         "start_line": i,
                         "end_line": i,
                     }
@@ -132,47 +259,25 @@ class SimpleTreeSitterChunker:
 
         return imports
 
-    def _find_function_end(self, lines: List[str], start_line: int) -> int:
-        """Find the end of a function/component (simplified)"""
-        brace_count = 0
-        in_function = False
-
-        for i in range(start_line, len(lines)):
-            line = lines[i]
-
-            # Count braces
-            brace_count += line.count("{")
-            brace_count -= line.count("}")
-
-            if not in_function and "{" in line:
-                in_function = True
-
-            if in_function and brace_count == 0:
-                return i
-
-        return len(lines) - 1
-
     def chunk_file(self, file_path: str) -> List[Dict[str, Any]]:
         """Chunk a TSX/TS file into meaningful code segments"""
         parsed_file = self.parse_file(file_path)
         if not parsed_file:
             return []
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            source_code = f.read()
+        source_code = parsed_file["content"]
 
         chunks = []
 
         # Extract different types of code segments
-        functions = self.extract_functions(parsed_file, source_code)
-        components = self.extract_components(parsed_file, source_code)
+        functions, components = self.extract_definitions(parsed_file, source_code)
         imports = self.extract_imports(parsed_file, source_code)
 
         # Add file-level metadata
         file_info = {
             "file_path": file_path,
             "file_name": Path(file_path).name,
-            "total_lines": len(source_code.split("\n")),
+            "total_lines": len(parsed_file["lines"]),
             "file_size": len(source_code),
         }
 
@@ -183,20 +288,24 @@ class SimpleTreeSitterChunker:
 
         return chunks
 
-    def chunk_directory(self, directory_path: str) -> List[Dict[str, Any]]:
-        """Chunk all TSX/TS files in a directory"""
-        all_chunks = []
+    def chunk_directory(
+        self, directory_path: str, workers: int = 1, chunksize: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Chunk all TSX/TS files in a directory, over `workers` processes if > 1"""
+        return list(self.iter_chunks(directory_path, workers, chunksize))
+
+    def iter_chunks(
+        self, directory_path: str, workers: int = 1, chunksize: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Lazily yield the chunks of all TSX/TS files in a directory, file by file"""
         directory = Path(directory_path)
 
         # Find all TSX and TS files
         tsx_files = list(directory.rglob("*.tsx"))
         ts_files = list(directory.rglob("*.ts"))
 
-        all_files = tsx_files + ts_files
+        all_files = [str(file_path) for file_path in tsx_files + ts_files]
 
-        for file_path in all_files:
+        for file_path, chunks in chunk_files(self, all_files, workers, chunksize):
             print(f"Chunking {file_path}...")
-            chunks = self.chunk_file(str(file_path))
-            all_chunks.extend(chunks)
-
-        return all_chunks
+            yield from chunks
@@ -0,0 +1,65 @@
+import mmap
+import os
+from typing import List, Optional
+
+# Files at least this large are decoded straight from a memory map instead of a read() copy
+MMAP_THRESHOLD = 1 << 20
+
+
+class SourceFile:
+    """
+    SourceFile is a source file read once: the bytes are decoded once, the text is split into
+    lines once, and a single line-offset index lets every extractor slice line ranges out of the
+    text without re-joining lines.
+    Line endings are normalized like text-mode open() does.
+    """
+
+    def __init__(self, path: str, text: str, data: Optional[bytes] = None):
+        self.path = path
+        self.text = text
+        self.data = data
+        self.lines: List[str] = text.split("\n")
+        self._line_offsets: Optional[List[int]] = None
+
+    @classmethod
+    def read(cls, path: str, keep_bytes: bool = False, mmap_threshold: int = MMAP_THRESHOLD) -> "SourceFile":
+        """
+        Read and decode a UTF-8 file. With keep_bytes the encoded bytes are kept in `data`
+        (e.g. for tree-sitter); otherwise files of at least mmap_threshold bytes are decoded
+        directly from a memory map.
+        """
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not keep_bytes and mmap_threshold and size >= mmap_threshold:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = None
+                    text = str(mapped, "utf-8")
+            else:
+                data = f.read()
+                text = data.decode("utf-8")
+
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+            if data is not None:
+                data = text.encode("utf-8")
+        return cls(path, text, data)
+
+    @property
+    def line_offsets(self) -> List[int]:
+        """Start offset of every line, plus a sentinel one past the end of the text"""
+        if self._line_offsets is None:
+            offsets = [0]
+            position = 0
+            for line in self.lines:
+                position += len(line) + 1
+                offsets.append(position)
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def line_range(self, start_line: int, end_line: int) -> str:
+        """Text of lines start_line..end_line inclusive, same as joining lines[start:end + 1]"""
+        offsets = self.line_offsets
+        end_line = min(end_line, len(self.lines) - 1)
+        if start_line > end_line:
+            return ""
+        return self.text[offsets[start_line] : offsets[end_line + 1] - 1]
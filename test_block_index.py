@@ -0,0 +1,94 @@
+import pytest
+
+from simple_tree_sitter_chunker import BlockIndex
+
+
+def test_block_spanning_lines():
+    lines = ["function a() {", "  if (x) {", "    y();", "  }", "}", "const b = 1;"]
+    index = BlockIndex(lines)
+    assert index.end(0) == 4
+    assert index.end(1) == 3
+
+
+def test_start_line_without_brace_uses_next_opening_line():
+    lines = ["// Header", "function a()", "{", "  return 1;", "}"]
+    assert BlockIndex(lines).end(0) == 4
+
+
+def test_braces_closing_on_their_own_line():
+    lines = ["const o = { a: 1 };", "const p = 2;"]
+    assert BlockIndex(lines).end(0) == 0
+
+
+def test_first_brace_still_open_decides_the_end():
+    lines = ["const f = ({ a }) => {", "  return a;", "};"]
+    assert BlockIndex(lines).end(0) == 2
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        ["const s = 'x';"],
+        ["const a = 1;", "const b = 2;"],
+        ["function a() {", "  return 1;"],
+    ],
+    ids=["no-brace", "no-brace-multiline", "never-closed"],
+)
+def test_last_line_when_no_block_or_unclosed(lines):
+    assert BlockIndex(lines).end(0) == len(lines) - 1
+
+
+def test_start_past_the_end():
+    assert BlockIndex(["{", "}"]).end(5) == 1
+
+
+@pytest.mark.parametrize(
+    "inner",
+    [
+        "  const s = \"}\";",
+        "  const s = '}';",
+        "  const s = 'it\\'s }';",
+        "  const s = \"a \\\" }\";",
+        "  // }",
+        "  /* } */",
+        "  const t = `}`;",
+    ],
+    ids=["double-quote", "single-quote", "escaped-single", "escaped-double", "line-comment", "block-comment", "template"],
+)
+def test_braces_in_strings_and_comments_are_ignored(inner):
+    lines = ["function a() {", inner, "}"]
+    assert BlockIndex(lines).end(0) == 2
+
+
+def test_block_comment_across_lines():
+    lines = ["function a() {", "  /*", "  } */", "}"]
+    assert BlockIndex(lines).end(0) == 3
+
+
+def test_template_literal_across_lines():
+    lines = ["function a() {", "  const t = `", "  }", "  `;", "}"]
+    assert BlockIndex(lines).end(0) == 4
+
+
+def test_template_expression_braces_count():
+    lines = ["function a() {", "  const t = `${x ? { a: 1 } : `${'}'}`}`;", "}"]
+    assert BlockIndex(lines).end(0) == 2
+
+
+def test_template_expression_across_lines():
+    lines = ["function a() {", "  const t = `a ${f(() => {", "  })} b`;", "}"]
+    index = BlockIndex(lines)
+    assert index.end(0) == 3
+    assert index.end(1) == 2
+
+
+def test_apostrophe_in_jsx_text_does_not_hide_braces():
+    lines = ["function a() {", "  return <p>Don't</p> <div onClick={() => {", "  }}/>", "}"]
+    index = BlockIndex(lines)
+    assert index.end(0) == 3
+    assert index.end(1) == 2
+
+
+def test_unclosed_quote_does_not_carry_to_the_next_line():
+    lines = ["function a() {", "  <p>It's</p>", "  <p>{x}</p>", "}"]
+    assert BlockIndex(lines).end(0) == 3
@@ -0,0 +1,52 @@
+import pytest
+
+from code_indexer import _build_filter
+
+
+def test_no_filters():
+    assert _build_filter() is None
+    assert _build_filter(chunk_type=[], file_path="", line_range=None, node_type="") is None
+
+
+@pytest.mark.parametrize(
+    "chunk_type, expected",
+    [
+        ("component", "(chunk_type IN ('component'))"),
+        (["component", "function"], "(chunk_type IN ('component', 'function'))"),
+        (("function",), "(chunk_type IN ('function'))"),
+    ],
+)
+def test_chunk_type(chunk_type, expected):
+    assert _build_filter(chunk_type=chunk_type) == expected
+
+
+@pytest.mark.parametrize(
+    "file_path, pattern",
+    [
+        ("src/components", "src/components%"),
+        ("./src/components", "src/components%"),
+        ("src/my_dir/100%", "src/my\\_dir/100\\%%"),
+        ("src/*/Button?.tsx", "src/%/Button_.tsx"),
+        ("src/my_dir/*.tsx", "src/my\\_dir/%.tsx"),
+        ("src/it's", "src/it''s%"),
+    ],
+    ids=["prefix", "dot-slash", "escaped-wildcards", "glob", "glob-escaped", "quote"],
+)
+def test_file_path(file_path, pattern):
+    assert _build_filter(file_path=file_path) == f"(file_path LIKE '{pattern}')"
+
+
+def test_line_range_keeps_overlapping_chunks():
+    assert _build_filter(line_range=(10, 50)) == "(start_line <= 50 AND end_line >= 10)"
+    assert _build_filter(line_range=("3", "7")) == "(start_line <= 7 AND end_line >= 3)"
+
+
+def test_node_type():
+    assert _build_filter(node_type="function_declaration") == "(node_type = 'function_declaration')"
+
+
+def test_filters_are_combined_with_and():
+    assert _build_filter(chunk_type="function", file_path="src", line_range=(3, 7), node_type="x") == (
+        "(chunk_type IN ('function')) AND (file_path LIKE 'src%') "
+        "AND (start_line <= 7 AND end_line >= 3) AND (node_type = 'x')"
+    )
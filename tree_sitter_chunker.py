@@ -1,9 +1,12 @@
 import os
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from tree_sitter import Language, Parser, Node
 import re
 
+from parallel_chunking import chunk_files
+from source_file import SourceFile
+
 class TreeSitterChunker:
     def __init__(self):
         """Initialize tree-sitter chunker with TypeScript/TSX grammar"""
@@ -14,12 +17,15 @@ class TreeSitterChunker:
         
     def parse_file(self, file_path: str) -> Optional[Node]:
         """Parse a TSX/TS file and return the syntax tree root node"""
+        parsed = self._parse_source(file_path)
+        return parsed[0] if parsed else None
+    
+    def _parse_source(self, file_path: str) -> Optional[Tuple[Node, SourceFile]]:
+        """Read a file once and parse its bytes; returns (root node, source) or None"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            tree = self.parser.parse(bytes(content, "utf8"))
-            return tree.root_node
+            source = SourceFile.read(file_path, keep_bytes=True)
+            tree = self.parser.parse(source.data)
+            return tree.root_node, source
         except Exception as e:
             print(f"Error parsing {file_path}: {e}")
             return None
@@ -124,12 +130,11 @@ class TreeSitterChunker:
     
     def chunk_file(self, file_path: str) -> List[Dict[str, Any]]:
         """Chunk a TSX/TS file into meaningful code segments"""
-        root_node = self.parse_file(file_path)
-        if not root_node:
+        parsed = self._parse_source(file_path)
+        if not parsed:
             return []
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source_code = f.read()
+        root_node, source = parsed
+        source_code = source.text
         
         chunks = []
         
@@ -142,7 +147,7 @@ class TreeSitterChunker:
         file_info = {
             'file_path': file_path,
             'file_name': Path(file_path).name,
-            'total_lines': len(source_code.split('\n')),
+            'total_lines': len(source.lines),
             'file_size': len(source_code)
         }
         
@@ -153,20 +158,20 @@ class TreeSitterChunker:
         
         return chunks
     
-    def chunk_directory(self, directory_path: str) -> List[Dict[str, Any]]:
-        """Chunk all TSX/TS files in a directory"""
-        all_chunks = []
+    def chunk_directory(self, directory_path: str, workers: int = 1, chunksize: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Chunk all TSX/TS files in a directory, over `workers` processes if > 1"""
+        return list(self.iter_chunks(directory_path, workers, chunksize))
+    
+    def iter_chunks(self, directory_path: str, workers: int = 1, chunksize: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily yield the chunks of all TSX/TS files in a directory, file by file"""
         directory = Path(directory_path)
         
         # Find all TSX and TS files
         tsx_files = list(directory.rglob("*.tsx"))
         ts_files = list(directory.rglob("*.ts"))
         
-        all_files = tsx_files + ts_files
+        all_files = [str(file_path) for file_path in tsx_files + ts_files]
         
-        for file_path in all_files:
+        for file_path, chunks in chunk_files(self, all_files, workers, chunksize):
             print(f"Chunking {file_path}...")
-            chunks = self.chunk_file(str(file_path))
-            all_chunks.extend(chunks)
-        
-        return all_chunks 
\ No newline at end of file
+            yield from chunks 
\ No newline at end of file
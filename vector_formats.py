@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+
+# Storage formats of the embedding column, from exact to smallest. For a d-dimensional embedding:
+#   float32  4d bytes, searched by LanceDB (cosine)
+#   float16  2d bytes, searched by LanceDB (cosine)
+#   int8     d bytes, symmetric scalar quantization, scanned exactly in numpy (LanceDB cannot
+#            search int8 vectors)
+#   binary   d/8 bytes of sign bits, searched by LanceDB (hamming), plus the int8 codes in
+#            `embedding_int8` to rescore the candidates
+# A float32 or float16 table may also keep a normalised k-dimensional prefix of every embedding
+# in `embedding_short` (Matryoshka truncation) for a cheap first search stage.
+VECTOR_FORMATS = ("float32", "float16", "int8", "binary")
+DEFAULT_VECTOR_FORMAT = "float32"
+
+VALUE_TYPES = {"float32": pa.float32(), "float16": pa.float16(), "int8": pa.int8(), "binary": pa.uint8()}
+
+
+def vector_fields(vector_format: str, dimension: int, short_dimension: Optional[int] = None) -> List[pa.Field]:
+    """
+    Schema fields holding a `dimension`-dimensional embedding in vector_format, plus its
+    `short_dimension` prefix when one is kept.
+    """
+    if vector_format not in VALUE_TYPES:
+        raise ValueError(f"Unknown vector format {vector_format!r}, expected one of: {', '.join(VECTOR_FORMATS)}")
+    if short_dimension and vector_format not in ("float32", "float16"):
+        raise ValueError(f"Short embeddings need a float32 or float16 table, not {vector_format}")
+    if short_dimension and not 0 < short_dimension < dimension:
+        raise ValueError(f"Short embedding dimension must be below {dimension}, got {short_dimension}")
+    if vector_format == "binary":
+        return [
+            pa.field("embedding", pa.list_(pa.uint8(), (dimension + 7) // 8)),
+            pa.field("embedding_int8", pa.list_(pa.int8(), dimension)),
+        ]
+    fields = [pa.field("embedding", pa.list_(VALUE_TYPES[vector_format], dimension))]
+    if short_dimension:
+        fields.append(pa.field("embedding_short", pa.list_(VALUE_TYPES[vector_format], short_dimension)))
+    return fields
+
+
+def schema_vector_format(schema: pa.Schema) -> str:
+    """
+    The vector format of a table schema, read from its embedding column type.
+    """
+    value_type = schema.field("embedding").type.value_type
+    return next(name for name, candidate in VALUE_TYPES.items() if candidate == value_type)
+
+
+def schema_dimension(schema: pa.Schema) -> int:
+    """
+    The embedding dimension of a table schema (binary columns pack 8 dimensions per byte).
+    """
+    if "embedding_int8" in schema.names:
+        return schema.field("embedding_int8").type.list_size
+    return schema.field("embedding").type.list_size
+
+
+def schema_short_dimension(schema: pa.Schema) -> Optional[int]:
+    """
+    The dimension of a table schema's short embedding prefix, or None if it keeps none.
+    """
+    if "embedding_short" not in schema.names:
+        return None
+    return schema.field("embedding_short").type.list_size
+
+
+def truncate_vectors(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Keep the first `dimension` components of each row and renormalise them.
+    """
+    prefix = vectors[:, :dimension]
+    norms = np.linalg.norm(prefix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return prefix / norms
+
+
+def quantize_int8(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale each row so its largest component maps to ±127 and round. Only the direction of a
+    vector matters for cosine similarity, so no per-row scale needs to be stored.
+    """
+    peak = np.abs(vectors).max(axis=1, keepdims=True)
+    peak[peak == 0] = 1.0
+    return np.rint(vectors * (127.0 / peak)).astype(np.int8)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """
+    Pack the sign bit of every component, 8 per byte.
+    """
+    return np.packbits(vectors > 0, axis=1)
+
+
+def encode_vectors(
+    vectors: np.ndarray, vector_format: str, short_dimension: Optional[int] = None
+) -> Dict[str, pa.Array]:
+    """
+    Encode float32 embeddings (one per row) as the Arrow columns of vector_format.
+    """
+    columns = {}
+    for field in vector_fields(vector_format, vectors.shape[1], short_dimension):
+        if field.name == "embedding_short":
+            values = truncate_vectors(vectors, short_dimension).astype(field.type.value_type.to_pandas_dtype())
+        elif field.name == "embedding_int8" or vector_format == "int8":
+            values = quantize_int8(vectors)
+        elif vector_format == "binary":
+            values = quantize_binary(vectors)
+        else:
+            values = vectors.astype(field.type.value_type.to_pandas_dtype())
+        columns[field.name] = pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), field.type.list_size)
+    return columns
+
+
+def cosine_similarity(query: np.ndarray, vectors: np.ndarray, block_rows: int = 256) -> np.ndarray:
+    """
+    Cosine similarity of a float32 query with every row of vectors (int8 codes, float16 or
+    float32). Rows are widened to float32 `block_rows` at a time, so the working set stays in
+    cache instead of materialising a float32 copy of the whole matrix.
+    """
+    similarity = np.empty(len(vectors), dtype=np.float32)
+    query_norm = np.linalg.norm(query) or 1.0
+    for start in range(0, len(vectors), block_rows):
+        block = vectors[start : start + block_rows].astype(np.float32)
+        norms = np.sqrt(np.einsum("ij,ij->i", block, block))
+        norms[norms == 0] = 1.0
+        similarity[start : start + block_rows] = block @ query / (norms * query_norm)
+    return similarity
+
+
+def fixed_size_list_to_numpy(column) -> np.ndarray:
+    """
+    View a (chunked) FixedSizeList column as a 2-D numpy array.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    return column.flatten().to_numpy().reshape(len(column), column.type.list_size)